@@ -0,0 +1,128 @@
+"""Benchmark the confusion table counting against the previous dict-based loop.
+
+Generates random objects with a gold label and a prediction, and times building the
+table from objects already in memory, and end-to-end from a JSON Lines file.
+
+In memory, encoding the values still looks up each one in a dict, so with a few labels
+it's only about as fast as the loop. The codes pay off with many labels, where the loop
+builds the dense table cell by cell (try `--classes 1000`), and end-to-end, where most
+of the gain comes from streaming the file instead of loading it.
+
+Run with: python benchmarks/bench_confusion_matrix.py --rows 2000000
+"""
+
+import json
+import random
+import string
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pandas as pd  # type: ignore
+
+from scripts.confusion_matrix import create_confusion_table
+from scripts.util import HelpOnErrorArgumentParser, iter_json
+
+
+def loop_confusion_table(
+    data: list[dict[str, Any]], field1: str, field2: str
+) -> pd.DataFrame:
+    """Previous implementation: count pairs in a dict, then build a dense table."""
+    confusion_matrix: dict[tuple[Any, Any], int] = defaultdict(int)
+
+    for item in data:
+        value1 = item.get(field1, "N/A")
+        value2 = item.get(field2, "N/A")
+        confusion_matrix[value1, value2] += 1
+
+    field1_values = sorted(set(f1 for f1, _ in confusion_matrix))
+    field2_values = sorted(set(f2 for _, f2 in confusion_matrix))
+
+    table_data = [
+        [confusion_matrix[(value1, value2)] for value2 in field2_values]
+        for value1 in field1_values
+    ]
+
+    df = pd.DataFrame(table_data, index=field1_values, columns=field2_values)  # type: ignore
+    df.index.name = field1
+    df.columns.name = field2
+
+    return df
+
+
+def timed[T](name: str, func: Callable[[], T], repeat: int) -> tuple[T, float]:
+    """Run `func` `repeat` times and print the best time."""
+    runs: list[tuple[float, T]] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append((time.perf_counter() - start, result))
+    best, result = min(runs, key=lambda run: run[0])
+    print(f"{name:<32} {best:8.3f}s")
+    return result, best
+
+
+def bench_in_memory(data: list[dict[str, Any]], repeat: int) -> None:
+    """Time both implementations on objects already in memory."""
+    loop, loop_time = timed(
+        "in memory, loop",
+        lambda: loop_confusion_table(data, "gold", "pred"),
+        repeat,
+    )
+    codes, codes_time = timed(
+        "in memory, codes",
+        lambda: create_confusion_table(data, "gold", "pred"),
+        repeat,
+    )
+    assert loop.equals(codes)  # type: ignore
+    print(f"{'speedup':<32} {loop_time / codes_time:8.1f}x\n")
+
+
+def main() -> None:
+    parser = HelpOnErrorArgumentParser(__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of objects")
+    parser.add_argument("--classes", type=int, default=10, help="Number of labels")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each case")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1.")
+
+    rng = random.Random(args.seed)
+    labels = [
+        "".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(args.classes)
+    ]
+    data = [
+        {"gold": rng.choice(labels), "pred": rng.choice(labels)}
+        for _ in range(args.rows)
+    ]
+    print(f"{args.rows:,} objects, {args.classes} labels\n")
+
+    bench_in_memory(data, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir, "data.jsonl")
+        path.write_text("".join(json.dumps(item) + "\n" for item in data))
+        # Free the objects, so the file benchmarks don't run with them in memory.
+        del data
+
+        def load_loop() -> pd.DataFrame:
+            with path.open() as f:
+                return loop_confusion_table(list(map(json.loads, f)), "gold", "pred")
+
+        def stream_codes() -> pd.DataFrame:
+            with path.open("rb") as f:
+                return create_confusion_table(iter_json(f), "gold", "pred")
+
+        _, loop_time = timed("JSON Lines file, load + loop", load_loop, args.repeat)
+        _, codes_time = timed(
+            "JSON Lines file, stream + codes", stream_codes, args.repeat
+        )
+        print(f"{'speedup':<32} {loop_time / codes_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark counting values over JSON Lines shards with different numbers of jobs.
+
+Generates shards of random objects, counts their values exactly and approximately with
+1, 2, 4... jobs up to the number of CPUs (or `--max-jobs`), and prints the speedup over
+one job. It also checks that the output is the same for every number of jobs.
+
+`,jfreq` only counts exactly with several jobs if `--jobs` is given, until this shows
+that it helps.
+
+Run with: python benchmarks/bench_json_freq.py --shards 32 --rows 200000
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import string
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from scripts.json_freq import show_approx_frequencies, show_frequencies
+from scripts.util import HelpOnErrorArgumentParser
+
+
+def timed(func: Callable[[], None], repeat: int) -> tuple[str, float]:
+    """Run `func` `repeat` times, returning its output and the best time."""
+    times: list[float] = []
+    output = ""
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        output = buffer.getvalue()
+    return output, min(times)
+
+
+def main() -> None:
+    parser = HelpOnErrorArgumentParser(__doc__)
+    parser.add_argument("--shards", type=int, default=16, help="Number of files")
+    parser.add_argument("--rows", type=int, default=100_000, help="Objects per file")
+    parser.add_argument("--users", type=int, default=100_000, help="Distinct users")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each case")
+    parser.add_argument(
+        "--max-jobs", type=int, default=os.cpu_count() or 1, help="Most jobs to run"
+    )
+    args = parser.parse_args()
+
+    max_jobs = args.max_jobs
+    jobs = [2**i for i in range(max_jobs.bit_length()) if 2**i <= max_jobs]
+    if jobs[-1] != max_jobs:
+        jobs.append(max_jobs)
+
+    rng = random.Random(args.seed)
+    users = [
+        "".join(rng.choices(string.ascii_lowercase, k=10)) for _ in range(args.users)
+    ]
+    statuses = ["ok", "error", "timeout", "retry"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths: list[Path] = []
+        for shard in range(args.shards):
+            path = Path(tmpdir, f"shard-{shard:04}.jsonl")
+            with path.open("w") as f:
+                for _ in range(args.rows):
+                    item = {"user": rng.choice(users), "status": rng.choice(statuses)}
+                    f.write(json.dumps(item) + "\n")
+            paths.append(path)
+
+        keys = ["user", "status"]
+        print(f"{args.shards} shards of {args.rows:,} objects, {os.cpu_count()} CPUs\n")
+
+        cases: dict[str, Callable[[int], Callable[[], None]]] = {
+            "exact": lambda n: lambda: show_frequencies(paths, keys, top=10, jobs=n),
+            "approx": lambda n: (
+                lambda: show_approx_frequencies(
+                    paths, keys, top=10, capacity=10_000, precision=14, jobs=n
+                )
+            ),
+        }
+        for name, case in cases.items():
+            baseline_output, baseline = timed(case(1), args.repeat)
+            print(f"{name:<8} jobs=1 {baseline:8.3f}s")
+            for n in jobs[1:]:
+                output, elapsed = timed(case(n), args.repeat)
+                assert output == baseline_output, f"Output differs with {n} jobs"
+                print(
+                    f"{name:<8} jobs={n:<2}{elapsed:8.3f}s {baseline / elapsed:6.2f}x"
+                    f" ({baseline / elapsed / n:.0%} efficiency)"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Benchmark the startup time of every console entry point, and check it's in budget.
+
+For each command in `[project.scripts]` of `pyproject.toml`, it measures:
+- import: time to import the module, from `python -X importtime`.
+- --help: wall time of running the command with `--help`.
+- tiny: wall time of running the command on a tiny input, for the commands that can run
+  without the network or a model.
+
+The wall times are the best of `--repeat` runs, including the interpreter's own startup,
+which is printed first. The largest third-party and standard library packages imported
+by each module are listed, so it's easy to see what to import lazily.
+
+Exits with status 1 if any wall time is over its budget, so it can be used as a
+regression check. The argparse commands have `--budget`. The Typer apps have the larger
+`--typer-budget`, because importing `typer` and `click` takes about 70-85 ms on its own,
+and rendering `--help` with `rich` takes about 85 ms more.
+
+Run with: PYTHONPATH=src python benchmarks/bench_startup.py --typer-budget 250
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tomllib
+from collections.abc import Sequence
+from pathlib import Path
+
+from scripts.util import HelpOnErrorArgumentParser
+
+_PYPROJECT = Path(__file__).parent.parent / "pyproject.toml"
+
+# Runs the entry point `{attr}` of `{module}` as if it were the command `{name}`.
+_RUNNER = (
+    "import sys; from {module} import {attr} as entry;"
+    " sys.argv[0] = {name!r}; sys.exit(entry())"
+)
+
+# Arguments for a run on tiny inputs. `{json}`, `{tsv}` and `{dir}` are replaced with the
+# paths of the inputs, and `{out}` with a path to write to. Commands that need a heavy
+# dependency for any input aren't here: `,confusion-matrix` renders with pandas, and
+# `,ntok` and `,count-hf-tokens` load a tokeniser.
+_TINY_ARGS: dict[str, list[str]] = {
+    ",json-keys": ["{json}"],
+    ",json-to-table": ["{json}"],
+    ",json-shuf": ["{json}", "{out}"],
+    ",rename-json": ["{json}", "{out}", "label:gold"],
+    ",json-schema": ["{json}", "{out}"],
+    ",jfreq": ["{json}", "label"],
+    ",jhead": ["{json}", "1"],
+    ",readtable": ["{tsv}"],
+    ",ll": ["{dir}"],
+    ",extsize": ["{dir}"],
+}
+
+# Commands built with Typer, which have `--typer-budget` instead of `--budget`. `,ntok`
+# only skips Typer when it hands a simple call to its daemon, so not for `--help`.
+_TYPER_COMMANDS = {",ntok", ",jfreq", ",blame", ",jhead", ",extsize"}
+
+# Number of packages shown as the heaviest imports of each module.
+_TOP_IMPORTS = 3
+
+
+def wall_time(args: Sequence[str], repeat: int) -> float:
+    """Best wall time of running `args` `repeat` times, in milliseconds.
+
+    Raises:
+        RuntimeError: if the command fails.
+    """
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(args, check=False, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{args} failed:\n{result.stderr}")
+    return min(times) * 1000
+
+
+def import_times(module: str, repeat: int) -> tuple[float, list[tuple[str, float]]]:
+    """Time to import `module`, and its heaviest top-level packages, in milliseconds.
+
+    Both are from `python -X importtime`, the best of `repeat` runs. The packages'
+    times include the packages they import, so they can overlap.
+    """
+    best: tuple[float, list[tuple[str, float]]] | None = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        packages: dict[str, float] = {}
+        total = 0.0
+        # Lines are `import time: self [us] | cumulative | name`, indented by depth.
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            name = name.strip()
+            if name == module:
+                total = int(cumulative) / 1000
+            elif "." not in name and not name.startswith("_") and name != "scripts":
+                packages[name] = max(packages.get(name, 0), int(cumulative) / 1000)
+
+        top = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        if best is None or total < best[0]:
+            best = total, top[:_TOP_IMPORTS]
+
+    assert best is not None, "repeat must be positive"
+    return best
+
+
+def make_inputs(tmpdir: Path) -> dict[str, str]:
+    """Create the tiny inputs in `tmpdir`, returning the values of the placeholders."""
+    items = [
+        {"label": "a", "pred": "a", "score": 0.9},
+        {"label": "b", "pred": "a", "score": 0.4},
+    ]
+    json_path = tmpdir / "tiny.json"
+    json_path.write_text(json.dumps(items))
+    tsv_path = tmpdir / "tiny.tsv"
+    tsv_path.write_text("label\tpred\na\ta\nb\ta\n")
+    return {
+        "json": str(json_path),
+        "tsv": str(tsv_path),
+        "dir": str(tmpdir),
+        "out": str(tmpdir / "out.json"),
+    }
+
+
+def main() -> None:
+    parser = HelpOnErrorArgumentParser(__doc__)
+    parser.add_argument(
+        "--budget", type=float, default=80, help="Most milliseconds per run"
+    )
+    parser.add_argument(
+        "--typer-budget",
+        type=float,
+        default=250,
+        help="Most milliseconds per run of the Typer apps",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each case")
+    parser.add_argument(
+        "--only", nargs="+", metavar="COMMAND", help="Only benchmark these commands"
+    )
+    args = parser.parse_args()
+
+    scripts: dict[str, str] = tomllib.loads(_PYPROJECT.read_text())["project"][
+        "scripts"
+    ]
+    if args.only:
+        scripts = {name: scripts[name] for name in args.only}
+
+    interpreter = wall_time([sys.executable, "-c", "pass"], args.repeat)
+    print(
+        f"Interpreter startup: {interpreter:.1f} ms. Budget: {args.budget:.0f} ms,"
+        f" {args.typer_budget:.0f} ms for the Typer apps.\n"
+    )
+    print(f"{'command':<18} {'import':>8} {'--help':>8} {'tiny':>8}  heaviest imports")
+
+    over_budget: list[str] = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inputs = make_inputs(Path(tmpdir))
+
+        for name, target in scripts.items():
+            module, attr = target.split(":")
+            runner = [
+                sys.executable,
+                "-c",
+                _RUNNER.format(module=module, attr=attr, name=name),
+            ]
+            imported, top = import_times(module, args.repeat)
+            cases = {"--help": wall_time([*runner, "--help"], args.repeat)}
+            if name in _TINY_ARGS:
+                tiny = [arg.format(**inputs) for arg in _TINY_ARGS[name]]
+                cases["tiny"] = wall_time([*runner, *tiny], args.repeat)
+
+            budget = args.typer_budget if name in _TYPER_COMMANDS else args.budget
+            cells: list[str] = []
+            for case in ("--help", "tiny"):
+                if case not in cases:
+                    cells.append(f"{'-':>8}")
+                    continue
+                over = cases[case] > budget
+                cells.append(f"{cases[case]:7.1f}{'!' if over else ' '}")
+                if over:
+                    over_budget.append(f"{name} {case}")
+
+            heaviest = ", ".join(f"{package} {ms:.0f}" for package, ms in top)
+            print(f"{name:<18} {imported:8.1f} {' '.join(cells)}  {heaviest}")
+
+    if over_budget:
+        print(f"\nOver budget: {', '.join(over_budget)}.")
+        sys.exit(1)
+    print("\nAll commands are within budget.")
+
+
+if __name__ == "__main__":
+    main()
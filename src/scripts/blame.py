@@ -11,6 +11,8 @@ from typing import Annotated
 
 import typer
 
+from scripts import profiling
+
 
 class Colour(Enum):
     RED = "\033[31m"
@@ -37,6 +39,7 @@ app = typer.Typer(
 
 
 @app.command(help=__doc__)
+@profiling.profiled
 def main(
     file: Annotated[Path, typer.Argument(help="File to get blame", exists=True)],
 ) -> None:
@@ -1,59 +1,641 @@
 #!/usr/bin/env python3
 """Print a confusion table from a JSON file and two fields.
 
+The file can be a JSON array of objects or JSON Lines, optionally compressed with gzip,
+bzip2 or Zstandard, and it's read incrementally. The values of the fields are encoded
+as integer codes in batches, and the table is counted from the codes with NumPy, so
+only the codes are kept in memory.
+
+Instead of two fields, one or more FIELD1:FIELD2 pairs can be given (e.g. a gold label
+against the predictions of several models), and all their tables are counted in a
+single pass over the file. The first field is the rows (gold labels) and the second is
+the columns (predictions).
+
+With `--metrics`, each table is followed by the per-class precision, recall and F1, and
+the accuracy, macro F1 and Cohen's kappa. They're derived from a square matrix over the
+values of both fields. With `--bootstrap B`, the accuracy and macro F1 also have
+confidence intervals from B bootstrap resamples, which are drawn as whole matrices so
+they take about the same time for any number of objects.
+
+The counts are kept as the pairs of values that occur, so fields with many distinct
+values (e.g. free-form answers) don't need the full table. With `--top K`, or if the
+full table would be too large, only the K most frequent values of each field are
+shown, and the rest are summed as "(other)". `--export` saves the counts of all the
+pairs to CSV or Parquet, without building the full table.
+
 Dependencies:
 - pandas
 """
 
-import argparse
+import itertools
 import json
-from collections import defaultdict
-from typing import Any
+import sys
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import pandas as pd  # type: ignore
-from beartype.door import is_bearable
+from scripts import profiling
+from scripts.util import HelpOnErrorArgumentParser, read_json
 
-from scripts.util import HelpOnErrorArgumentParser
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+    import pandas as pd  # type: ignore
 
+# Number of objects whose values are encoded at once, small enough that the objects
+# stay in the CPU cache while each field is read.
+_BATCH_SIZE = 4096
 
-def create_confusion_table(
-    data: list[dict[str, Any]], field1: str, field2: str
-) -> pd.DataFrame:
-    confusion_matrix: dict[tuple[Any, Any], int] = defaultdict(int)
+# Maximum number of cells in a dense table. Larger tables are shown as a top-K view.
+_DENSE_CELLS = 1 << 20
 
-    for item in data:
-        value1 = item.get(field1, "N/A")
-        value2 = item.get(field2, "N/A")
-        confusion_matrix[value1, value2] += 1
+# Number of rows and columns of the top-K view when the table is too large.
+_DEFAULT_TOP = 20
 
-    field1_values = sorted(set(f1 for f1, _ in confusion_matrix))
-    field2_values = sorted(set(f2 for _, f2 in confusion_matrix))
+# Label of the row and column with the values outside the top-K view.
+_OTHER = "(other)"
 
-    table_data = [
-        [confusion_matrix[(value1, value2)] for value2 in field2_values]
-        for value1 in field1_values
-    ]
+# Maximum number of cells drawn at once for bootstrap resamples.
+_BOOTSTRAP_CELLS = 1 << 22
+
+# Value used when an object doesn't have the field.
+_MISSING = "N/A"
+
+
+@dataclass
+class LabelCodes:
+    """Values of a field, encoded as indices into the sorted unique values.
+
+    Attributes:
+        codes: Index in `values` of the value of each object.
+        values: Sorted unique values of the field.
+    """
+
+    codes: "npt.NDArray[np.int64]"
+    values: list[Any]
+
+
+class _CodeIndex(dict[Any, int]):
+    """Dict that assigns the next code to a value the first time it's looked up."""
+
+    def __missing__(self, value: Any) -> int:
+        self[value] = code = len(self)
+        return code
+
+
+class _LabelEncoder:
+    """Maps the values of a field to codes, assigned in order of first appearance."""
+
+    def __init__(self) -> None:
+        self.index = _CodeIndex()
+        self.chunks: list[npt.NDArray[np.int64]] = []
+
+    def add(self, batch: Sequence[dict[str, Any]], field: str) -> None:
+        import numpy as np
+
+        values = [item.get(field, _MISSING) for item in batch]
+        # The values are encoded in a single pass: `map` looks up each one in C, and
+        # only the first occurrence of a value calls `__missing__` in Python.
+        codes = map(self.index.__getitem__, values)
+        self.chunks.append(np.fromiter(codes, dtype=np.int64, count=len(values)))
+
+    def finish(self) -> LabelCodes:
+        import numpy as np
+
+        values = _sorted_values(list(self.index))
+        # Remap the codes from the order of first appearance to the sorted order.
+        rank = np.empty(len(values), dtype=np.int64)
+        rank[[self.index[value] for value in values]] = np.arange(len(values))
+        codes = np.concatenate(self.chunks) if self.chunks else np.empty(0, np.int64)
+        return LabelCodes(rank[codes], values)
+
+
+def _sorted_values(values: list[Any]) -> list[Any]:
+    """Sort values, by their string representation if they can't be compared."""
+    try:
+        return sorted(values)
+    except TypeError:
+        return sorted(values, key=str)
+
+
+def encode_fields(
+    data: Iterable[dict[str, Any]], fields: Sequence[str], batch_size: int = _BATCH_SIZE
+) -> dict[str, LabelCodes]:
+    """Encode the values of each field of the objects in `data` in a single pass.
+
+    Objects without a field have the value "N/A".
+
+    Raises:
+        ValueError: if an item of `data` isn't an object.
+    """
+    encoders = {field: _LabelEncoder() for field in fields}
+
+    for batch in itertools.batched(data, batch_size):
+        # The annotation isn't enforced: `data` is usually parsed from a file. Only
+        # objects have `get`, so other items are found without checking every item.
+        try:
+            for field, encoder in encoders.items():
+                encoder.add(batch, field)
+        except AttributeError as e:
+            raise ValueError("Invalid JSON format. Expected a list of objects.") from e
+
+    return {field: encoder.finish() for field, encoder in encoders.items()}
+
+
+@dataclass
+class SparseCounts:
+    """Counts of the pairs of values that occur, in coordinate (COO) format.
+
+    Attributes:
+        rows: Code of the value of the first field of each pair.
+        cols: Code of the value of the second field of each pair.
+        counts: Number of objects with each pair. Always positive.
+        row_values: Sorted unique values of the first field.
+        col_values: Sorted unique values of the second field.
+    """
+
+    rows: "npt.NDArray[np.int64]"
+    cols: "npt.NDArray[np.int64]"
+    counts: "npt.NDArray[np.int64]"
+    row_values: list[Any]
+    col_values: list[Any]
+
+    def class_totals(
+        self,
+    ) -> "tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]":
+        """Number of correct, predicted and gold objects of each class.
+
+        The counts must have been aligned with `align_counts`, so the rows and columns
+        have the same classes.
+        """
+        import numpy as np
+
+        classes = len(self.row_values)
+        diagonal = self.rows == self.cols
+        return (
+            np.bincount(
+                self.rows[diagonal], self.counts[diagonal], minlength=classes
+            ).astype(np.int64),
+            np.bincount(self.cols, self.counts, minlength=classes).astype(np.int64),
+            np.bincount(self.rows, self.counts, minlength=classes).astype(np.int64),
+        )
+
+    def dense(self) -> "npt.NDArray[np.int64]":
+        """Counts as a dense matrix, with 0 for the pairs that don't occur.
+
+        The cell `[i, j]` is the count of `row_values[i]` and `col_values[j]`.
+        """
+        import numpy as np
+
+        matrix = np.zeros((len(self.row_values), len(self.col_values)), dtype=np.int64)
+        matrix[self.rows, self.cols] = self.counts
+        return matrix
+
+
+def count_pairs_sparse(labels1: LabelCodes, labels2: LabelCodes) -> SparseCounts:
+    """Count the objects with each pair of values that occurs.
+
+    Memory depends on the number of distinct pairs and not on the number of possible
+    pairs, so it works for fields with many distinct values.
+    """
+    import numpy as np
+
+    n1, n2 = len(labels1.values), len(labels2.values)
+    pairs = labels1.codes * n2 + labels2.codes
+    if n1 * n2 <= _DENSE_CELLS:
+        dense = np.bincount(pairs, minlength=n1 * n2)
+        keys = np.flatnonzero(dense)
+        counts = dense[keys]
+    else:
+        keys, counts = np.unique(pairs, return_counts=True)
+    rows, cols = np.divmod(keys, n2)
+    return SparseCounts(
+        rows.astype(np.int64),
+        cols.astype(np.int64),
+        counts.astype(np.int64),
+        labels1.values,
+        labels2.values,
+    )
+
+
+def align_counts(counts: SparseCounts) -> SparseCounts:
+    """Recode `counts` with the union of the values of both fields, so it's square."""
+    import numpy as np
+
+    values = _sorted_values(list(dict.fromkeys(counts.row_values + counts.col_values)))
+    position = {value: i for i, value in enumerate(values)}
+
+    def recode(
+        old_values: list[Any], codes: "npt.NDArray[np.int64]"
+    ) -> "npt.NDArray[np.int64]":
+        lookup = np.array([position[value] for value in old_values], dtype=np.int64)
+        return lookup[codes]
+
+    return SparseCounts(
+        recode(counts.row_values, counts.rows),
+        recode(counts.col_values, counts.cols),
+        counts.counts,
+        values,
+        values,
+    )
+
+
+def _safe_divide(
+    num: "npt.NDArray[Any] | np.number[Any]", den: "npt.NDArray[Any] | np.number[Any]"
+) -> "npt.NDArray[np.float64]":
+    """Divide element-wise, with 0 where the denominator is 0."""
+    import numpy as np
+
+    return np.divide(
+        num,
+        den,
+        out=np.zeros(np.broadcast_shapes(num.shape, den.shape)),
+        where=den != 0,
+    )
+
+
+def _class_scores(
+    true_positives: "npt.NDArray[Any]",
+    predicted: "npt.NDArray[Any]",
+    support: "npt.NDArray[Any]",
+) -> "tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]":
+    """Precision, recall and F1 of each class, with the class as the last dimension.
+
+    They're 0 when undefined (e.g. precision of a class that is never predicted).
+    """
+    precision = _safe_divide(true_positives, predicted)
+    recall = _safe_divide(true_positives, support)
+    f1 = _safe_divide(2 * precision * recall, precision + recall)
+    return precision, recall, f1
+
+
+def _macro_average(
+    scores: "npt.NDArray[np.float64]",
+    predicted: "npt.NDArray[Any]",
+    support: "npt.NDArray[Any]",
+) -> "npt.NDArray[np.float64]":
+    """Mean of the per-class `scores` over the classes that are gold or predicted."""
+    present = (predicted + support) > 0
+    return _safe_divide((scores * present).sum(axis=-1), present.sum(axis=-1))
 
-    df = pd.DataFrame(table_data, index=field1_values, columns=field2_values)  # type: ignore
+
+def bootstrap_metrics(
+    counts: SparseCounts, resamples: int, seed: int
+) -> "tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]":
+    """Accuracy and macro F1 of bootstrap resamples of the objects in `counts`.
+
+    The counts must have been aligned with `align_counts`. Resampling the N objects
+    with replacement is the same as drawing the counts of the pairs from a multinomial
+    with the observed proportions, so each resampled matrix is drawn directly instead
+    of resampling the label codes. Only the pairs that occur are drawn, for many
+    resamples at once.
+
+    Returns:
+        Accuracy and macro F1 of each resample.
+    """
+    import numpy as np
+
+    total = int(counts.counts.sum())
+    if total == 0:
+        return np.zeros(0), np.zeros(0)
+
+    classes = len(counts.row_values)
+    rows, cols = counts.rows, counts.cols
+    diagonal = rows == cols
+    probabilities = counts.counts / total
+
+    rng = np.random.default_rng(seed)
+    batch_size = max(1, _BOOTSTRAP_CELLS // len(probabilities))
+    accuracies: list[npt.NDArray[np.float64]] = []
+    f1s: list[npt.NDArray[np.float64]] = []
+
+    for start in range(0, resamples, batch_size):
+        size = min(batch_size, resamples - start)
+        draws = rng.multinomial(total, probabilities, size=size)
+        # Sum the cells of each class in all resamples at once, by offsetting the
+        # classes of each resample into their own range of bins.
+        offsets = np.arange(size)[:, None] * classes
+
+        def class_sums(
+            cell_classes: "npt.NDArray[np.int64]", counts: "npt.NDArray[np.int64]"
+        ) -> "npt.NDArray[Any]":
+            bins = (offsets + cell_classes).ravel()
+            sums = np.bincount(bins, weights=counts.ravel(), minlength=size * classes)
+            return sums.reshape(size, classes)
+
+        true_positives = class_sums(rows[diagonal], draws[:, diagonal])
+        support = class_sums(rows, draws)
+        predicted = class_sums(cols, draws)
+
+        accuracies.append(true_positives.sum(axis=-1) / total)
+        _, _, f1 = _class_scores(true_positives, predicted, support)
+        f1s.append(_macro_average(f1, predicted, support))
+
+    return np.concatenate(accuracies), np.concatenate(f1s)
+
+
+def _cohen_kappa(
+    correct: "npt.NDArray[Any] | np.number[Any]",
+    predicted: "npt.NDArray[Any]",
+    support: "npt.NDArray[Any]",
+) -> "npt.NDArray[np.float64]":
+    """Cohen's kappa from the `correct` total and the `predicted` and gold per class.
+
+    It's the agreement between the gold labels and the predictions, corrected for the
+    agreement expected by chance given how often each label is used by either. It's NaN
+    when the chance agreement is 1 (e.g. a single label).
+    """
+    import numpy as np
+
+    total = support.sum(axis=-1)
+    observed = _safe_divide(correct, total)
+    chance = _safe_divide((support * predicted).sum(axis=-1), total**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (observed - chance) / (1 - chance)
+
+
+def confusion_table(counts: SparseCounts, field1: str, field2: str) -> "pd.DataFrame":
+    """Table with the counts of each pair of values of `field1` and `field2`."""
+    import pandas as pd  # type: ignore
+
+    df = pd.DataFrame(
+        counts.dense(), index=counts.row_values, columns=counts.col_values
+    )  # type: ignore
     df.index.name = field1
     df.columns.name = field2
+    return df
+
+
+def create_confusion_table(
+    data: Iterable[dict[str, Any]], field1: str, field2: str
+) -> "pd.DataFrame":
+    labels = encode_fields(data, [field1, field2])
+    counts = count_pairs_sparse(labels[field1], labels[field2])
+    return confusion_table(counts, field1, field2)
+
+
+def top_k_table(
+    counts: SparseCounts, k: int, field1: str, field2: str
+) -> "pd.DataFrame":
+    """Table with the `k` most frequent values of each field, and the rest as "other".
+
+    The rows and columns are sorted by frequency. The counts of the other values are
+    summed into an "(other)" row and column, which are omitted if empty.
+    """
+    import numpy as np
+    import pandas as pd  # type: ignore
+
+    def top_values(
+        codes: "npt.NDArray[np.int64]", size: int
+    ) -> "npt.NDArray[np.int64]":
+        totals = np.bincount(codes, counts.counts, minlength=size)
+        return np.argsort(-totals, kind="stable")[:k]
+
+    def fold(
+        codes: "npt.NDArray[np.int64]", top: "npt.NDArray[np.int64]", size: int
+    ) -> "npt.NDArray[np.int64]":
+        # Position of each value in the view, with the values outside it at the end.
+        position = np.full(size, len(top), dtype=np.int64)
+        position[top] = np.arange(len(top))
+        return position[codes]
+
+    n1, n2 = len(counts.row_values), len(counts.col_values)
+    top_rows, top_cols = top_values(counts.rows, n1), top_values(counts.cols, n2)
+    rows, cols = fold(counts.rows, top_rows, n1), fold(counts.cols, top_cols, n2)
 
+    shape = (len(top_rows) + 1, len(top_cols) + 1)
+    matrix = np.bincount(
+        rows * shape[1] + cols, counts.counts, minlength=shape[0] * shape[1]
+    ).astype(np.int64)
+
+    df = pd.DataFrame(
+        matrix.reshape(shape),
+        index=[counts.row_values[i] for i in top_rows] + [_OTHER],
+        columns=[counts.col_values[i] for i in top_cols] + [_OTHER],
+    )  # type: ignore
+    if len(top_rows) == n1:
+        df = df.drop(index=_OTHER)  # type: ignore
+    if len(top_cols) == n2:
+        df = df.drop(columns=_OTHER)  # type: ignore
+    df.index.name = field1
+    df.columns.name = field2
     return df
 
 
+def export_counts(path: Path, tables: list[tuple[str, str, SparseCounts]]) -> None:
+    """Save the counts of each pair of fields as CSV or Parquet, based on the suffix.
+
+    The output has one row per pair of values that occurs, with the names of the
+    fields, their values and the count. Values that aren't strings are saved as JSON.
+
+    Raises:
+        ValueError: if the suffix isn't `.csv` or `.parquet`.
+    """
+    if path.suffix not in (".csv", ".parquet"):
+        raise ValueError(f"Unsupported export format: {path.suffix!r}")
+
+    import pandas as pd  # type: ignore
+
+    def as_str(values: list[Any], codes: "npt.NDArray[np.int64]") -> list[str]:
+        strings = [v if isinstance(v, str) else json.dumps(v) for v in values]
+        return [strings[code] for code in codes]
+
+    df = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "field1": field1,
+                    "field2": field2,
+                    "value1": as_str(counts.row_values, counts.rows),
+                    "value2": as_str(counts.col_values, counts.cols),
+                    "count": counts.counts,
+                }
+            )  # type: ignore
+            for field1, field2, counts in tables
+        ],
+        ignore_index=True,
+    )  # type: ignore
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False)  # type: ignore
+    else:
+        df.to_parquet(path, index=False)  # type: ignore
+
+
+def render_metrics(
+    counts: SparseCounts,
+    field1: str,
+    *,
+    bootstrap: int = 0,
+    seed: int = 0,
+    confidence: float = 0.95,
+) -> str:
+    """Per-class and overall metrics of `counts`, aligned with `align_counts`.
+
+    The metrics are computed from the counts of the pairs that occur, so they don't
+    need the full square matrix. If `bootstrap` is positive, the accuracy and macro F1
+    include a percentile confidence interval from that many bootstrap resamples.
+    """
+    import numpy as np
+    import pandas as pd  # type: ignore
+
+    correct, predicted, support = counts.class_totals()
+    precision, recall, f1 = _class_scores(correct, predicted, support)
+
+    per_class = pd.DataFrame(
+        {"precision": precision, "recall": recall, "f1": f1, "support": support},
+        index=counts.row_values,
+    )  # type: ignore
+    per_class.index.name = field1
+
+    intervals = ["", ""]
+    if bootstrap > 0 and support.sum() > 0:
+        quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+        for i, samples in enumerate(bootstrap_metrics(counts, bootstrap, seed)):
+            low, high = np.quantile(samples, quantiles)
+            intervals[i] = f"  [{low:.4f}, {high:.4f}]"
+
+    accuracy_ = _safe_divide(correct.sum(), support.sum())
+    macro_f1_ = _macro_average(f1, predicted, support)
+    kappa = _cohen_kappa(correct.sum(), predicted, support)
+
+    with pd.option_context("display.float_format", "{:.4f}".format):  # type: ignore
+        lines = [str(per_class), ""]
+    lines += [
+        f"accuracy       {accuracy_:.4f}{intervals[0]}",
+        f"macro F1       {macro_f1_:.4f}{intervals[1]}",
+        f"Cohen's kappa  {kappa:.4f}",
+    ]
+    if any(intervals):
+        lines.append(f"\n{confidence:.0%} CIs from {bootstrap:,} bootstrap resamples.")
+    return "\n".join(lines)
+
+
+def _parse_pairs(fields: list[str]) -> list[tuple[str, str]] | None:
+    """Parse two field names or FIELD1:FIELD2 pairs. Returns None if invalid."""
+    if all(":" not in field for field in fields):
+        return [(fields[0], fields[1])] if len(fields) == 2 else None
+
+    pairs: list[tuple[str, str]] = []
+    for field in fields:
+        field1, sep, field2 = field.partition(":")
+        if not (sep and field1 and field2):
+            return None
+        pairs.append((field1, field2))
+    return pairs
+
+
 def main():
     parser = HelpOnErrorArgumentParser(__doc__)
-    parser.add_argument("file", type=argparse.FileType(), help="Path to the JSON file")
-    parser.add_argument("field1", type=str, help="Name of the first field")
-    parser.add_argument("field2", type=str, help="Name of the second field")
+    parser.add_argument(
+        "file", help="Path to the JSON file (can be compressed), or - for stdin"
+    )
+    parser.add_argument(
+        "fields",
+        nargs="+",
+        metavar="field",
+        help="Names of the two fields, or one or more FIELD1:FIELD2 pairs",
+    )
+    parser.add_argument(
+        "--metrics",
+        "-m",
+        action="store_true",
+        help="Print per-class precision, recall and F1, accuracy, macro F1 and kappa",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        "-b",
+        type=int,
+        default=0,
+        metavar="B",
+        help="Add confidence intervals to the metrics from B bootstrap resamples",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the bootstrap intervals",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Random seed used for bootstrapping"
+    )
+    parser.add_argument(
+        "--top",
+        "-k",
+        type=int,
+        metavar="K",
+        help="Show only the K most frequent values of each field, and the rest as"
+        f" {_OTHER}. Used with K={_DEFAULT_TOP} if the full table is too large.",
+    )
+    parser.add_argument(
+        "--export",
+        type=Path,
+        metavar="PATH",
+        help="Save the counts of all pairs of values to a .csv or .parquet file",
+    )
     args = parser.parse_args()
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be between 0 and 1.")
+
+    pairs = _parse_pairs(args.fields)
+    if pairs is None:
+        parser.error("Expected two field names or FIELD1:FIELD2 pairs.")
+
+    if args.export and args.export.suffix not in (".csv", ".parquet"):
+        parser.error("--export must be a .csv or .parquet file.")
+
+    fields = list(dict.fromkeys(field for pair in pairs for field in pair))
+    # Encoding includes reading the file, which is also its own phase.
+    with profiling.phase("encode") as phase:
+        labels = encode_fields(read_json(args.file), fields)
+        phase.records += len(labels[fields[0]].codes)
+
+    tables: list[tuple[str, str, SparseCounts]] = []
+    for i, (field1, field2) in enumerate(pairs):
+        if i > 0:
+            print()
+
+        labels1, labels2 = labels[field1], labels[field2]
+        with profiling.phase("count") as phase:
+            counts = count_pairs_sparse(labels1, labels2)
+            phase.records += len(labels1.codes)
+        tables.append((field1, field2, counts))
+
+        top = args.top
+        if top is None and len(labels1.values) * len(labels2.values) > _DENSE_CELLS:
+            top = _DEFAULT_TOP
+        with profiling.phase("render") as phase:
+            if top is None:
+                table = confusion_table(counts, field1, field2)
+            else:
+                table = top_k_table(counts, top, field1, field2)
+            print(table)
+            phase.records += len(counts.counts)
+            phase.bytes += len(table)
 
-    data = json.load(args.file)
-    if not is_bearable(data, list[dict[str, Any]]):
-        raise ValueError("Invalid JSON format. Expected a list of objects.")
+        if args.metrics or args.bootstrap > 0:
+            print()
+            with profiling.phase("metrics") as phase:
+                metrics = render_metrics(
+                    align_counts(counts),
+                    field1,
+                    bootstrap=args.bootstrap,
+                    seed=args.seed,
+                    confidence=args.confidence,
+                )
+                phase.records += len(labels1.codes)
+            with profiling.phase("render") as phase:
+                print(metrics)
+                phase.bytes += len(metrics)
 
-    table = create_confusion_table(data, args.field1, args.field2)
-    print(table)
+    if args.export:
+        with profiling.phase("export") as phase:
+            try:
+                export_counts(args.export, tables)
+            except ImportError as e:
+                sys.exit(f"Error: exporting to Parquet requires pyarrow. {e}")
+            phase.records += sum(len(counts.counts) for _, _, counts in tables)
+            phase.bytes += args.export.stat().st_size
 
 
 if __name__ == "__main__":
@@ -5,28 +5,27 @@ also print the longest sequence itself.
 
 It can also save a new JSON file with the added token count for each item.
 
-The input format a JSON file with a list of objects. Each object must have an "input"
-key with the text to tokenise.
+The input format a JSON file with a list of objects, or JSON Lines. Each object must
+have an "input" key with the text to tokenise. It can be compressed with gzip, bzip2 or
+Zstandard.
 """
 
 # pyright: basic
-import argparse
-import json
 import os
 from typing import Any, cast
 
-from beartype.door import is_bearable
+from scripts.util import HelpOnErrorArgumentParser, is_object_list, load_json
 
-from scripts.util import HelpOnErrorArgumentParser
-
-# Disable "None of PyTorch, TensorFlow >= 2.0, or Flax have been found." warning.
+# Disable "None of PyTorch, TensorFlow >= 2.0, or Flax have been found." warning. It
+# must be set before transformers is imported.
 os.environ["TRANSFORMERS_VERBOSITY"] = "error"
-from transformers import AutoTokenizer
 
 
 def longest_sequence(
     model_name: str, data: list[dict[str, Any]]
 ) -> tuple[list[str], list[str]]:
+    from transformers import AutoTokenizer
+
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     longest_seq: list[str] | None = None
     longest_split: list[str] | None = None
@@ -45,8 +44,7 @@ def main() -> None:
     parser = HelpOnErrorArgumentParser(__doc__)
     parser.add_argument(
         "input",
-        type=argparse.FileType("r"),
-        help="Input file path",
+        help="Input file path, or - for stdin",
         nargs="?",
         default="-",
     )
@@ -64,10 +62,10 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    data = json.load(args.input)
+    data = load_json(args.input)
 
     data_keys = {"input"}
-    if not is_bearable(data, list[dict[str, Any]]):
+    if not is_object_list(data):
         raise SystemExit("Invalid JSON format. Expected a list of objects.")
     if missing := data_keys - data[0].keys():
         raise SystemExit(f"Invalid JSON format. Missing keys: {missing}.")
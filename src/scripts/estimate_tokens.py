@@ -1,14 +1,93 @@
-"""Estimate the number of tokens in the input file (or stdin) using the GPT-4 tokeniser."""
+"""Estimate the number of tokens in the input files (or stdin) using the GPT-4 tokeniser.
 
+The input is read and tokenised in chunks, so memory usage stays flat regardless of the
+input size. Chunks are only split at whitespace boundaries that the tokeniser can't
+merge across, so the count is the same as tokenising the whole text at once (except for
+text with no whitespace for megabytes, which has to be cut somewhere).
+
+Inputs can be files, directories (searched recursively) or glob patterns. With more than
+one file, they are counted in parallel and the output shows the count for each file,
+subtotals per extension and the grand total. Binary files are skipped.
+
+Counts are cached in an SQLite database in `$XDG_CACHE_HOME/scripts` (`~/.cache/scripts`
+by default), keyed by the hash of the content and the encoding name, so counting the
+same content again doesn't need to load the tokeniser.
+
+With `--serve`, runs as a daemon that keeps the tokeniser loaded and listens on a Unix
+socket. While it's running, other calls send the content that isn't cached to the daemon
+instead of loading tiktoken themselves, which is much faster for many small calls (e.g.
+in shell loops or editor hooks). If the daemon isn't running, they count in-process. The
+socket is in a directory only the user can access. Counting a single file or stdin with
+the daemon doesn't even import this module: see `scripts.ntok_client`.
+
+With `--json-field`, the inputs are JSON arrays or JSON Lines datasets (optionally
+compressed with gzip, bzip2 or Zstandard) and the tokens in the given fields are counted
+for each record. The output shows the distribution of the counts (min, mean, percentiles,
+max and a histogram) and how many records exceed the context limit. Records where a field
+is missing or null are left out of its statistics and counted as missing. Records are
+streamed and tokenised in batches, so memory is bounded.
+"""
+
+import codecs
+import functools
+import glob
+import hashlib
+import itertools
+import json
+import marshal
+import os
+import re
+import signal
+import socketserver
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Annotated
+from typing import IO, TYPE_CHECKING, Annotated, Any, Self, cast
 
-import tiktoken
 import typer
 
-# GPT-4 and later tokeniser.
-_GPT_TOKENISER = tiktoken.get_encoding("cl100k_base")
+from scripts import profiling
+from scripts.ntok_client import DEFAULT_ENCODING, daemon_socket_path, query_daemon
+from scripts.util import read_json
+
+if TYPE_CHECKING:
+    import tiktoken
+
+# Size of each chunk read from the input, in bytes.
+_CHUNK_SIZE = 1 << 20
+
+# Number of bytes checked for NUL bytes when detecting binary files. Same as git.
+_BINARY_CHECK_SIZE = 8000
+
+# Maximum number of entries in the cache. The least recently used are evicted first.
+_CACHE_MAX_ENTRIES = 100_000
+
+# Number of records tokenised together with `--json-field`.
+_JSON_BATCH_SIZE = 4096
+
+# The cl100k and o200k pre-tokenisers never produce a piece that continues past a newline
+# followed by non-whitespace, or one where non-whitespace is followed by a space or tab.
+# The exception is `/`, which o200k joins to punctuation and the newlines after it.
+# Greedy `.*` backtracks from the end, so this finds the last such boundary.
+_LAST_SPLIT = re.compile(r"(?s:.*)(?:(?<=\n)(?=[^\s/])|(?<=\S)(?=[ \t]))")
+
+# Older encodings (gpt2, r50k, p50k) split runs of whitespace depending on what follows
+# them, so a chunk can't end in one. These boundaries are next to a single space or
+# newline between non-whitespace, which is a piece (or the start of one) either way.
+_LAST_SPLIT_STRICT = re.compile(r"(?s:.*)(?:(?<=\S\n)(?=[^\s/])|(?<=\S)(?= \S))")
+
+# Encodings whose chunks can be split with `_LAST_SPLIT`. Others use the strict split.
+_LOOSE_SPLIT_ENCODINGS = frozenset({"cl100k_base", "o200k_base", "o200k_harmony"})
+
+# Most characters held while looking for a safe boundary. Text without one (e.g. minified
+# or base64 data without whitespace) is cut here, which may change the count by a token.
+_MAX_CARRY = 4 * _CHUNK_SIZE
 
 app = typer.Typer(
     context_settings={"help_option_names": ["-h", "--help"]},
@@ -19,21 +98,828 @@ app = typer.Typer(
 )
 
 
+@functools.cache
+def _encoding(name: str) -> "tiktoken.Encoding":
+    """Load the tiktoken encoding `name`. Only imports tiktoken when first called."""
+    import tiktoken
+
+    return tiktoken.get_encoding(name)
+
+
+def split_safe_chunks(
+    blocks: Iterable[str],
+    encoding: str = DEFAULT_ENCODING,
+    max_carry: int = _MAX_CARRY,
+) -> Iterator[str]:
+    """Re-split text `blocks` at boundaries where `encoding` tokenisation is unaffected.
+
+    Each yielded chunk can be tokenised independently, and the sum of their token
+    counts is equal to the count of the concatenated text. If a block has no safe
+    boundary (e.g. a long run without whitespace), it is held until one is found, or
+    until more than `max_carry` characters are held, when they are yielded as they are.
+    """
+    last_split = (
+        _LAST_SPLIT if encoding in _LOOSE_SPLIT_ENCODINGS else _LAST_SPLIT_STRICT
+    )
+    carry = ""
+    for block in blocks:
+        text = carry + block
+        # The held text has no boundary, except maybe at its end, where the lookaheads
+        # couldn't see the next block. Starting there keeps the scan linear.
+        match = last_split.match(text, max(len(carry) - 1, 0))
+        if match is None:
+            if len(text) > max_carry:
+                yield text
+                text = ""
+            carry = text
+            continue
+
+        split = match.end()
+        carry = text[split:]
+        yield text[:split]
+
+    if carry:
+        yield carry
+
+
+def count_tokens(
+    file: IO[bytes], encoding: str = DEFAULT_ENCODING, chunk_size: int = _CHUNK_SIZE
+) -> tuple[int, int]:
+    """Count `encoding` tokens in UTF-8 `file`, streamed in chunks of `chunk_size` bytes.
+
+    Returns:
+        Tuple of number of tokens and number of bytes read.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    n_bytes = 0
+
+    def blocks() -> Iterator[str]:
+        nonlocal n_bytes
+        while block := file.read(chunk_size):
+            n_bytes += len(block)
+            yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+
+    tokeniser = _encoding(encoding)
+    n_tokens = sum(
+        len(tokeniser.encode(chunk)) for chunk in split_safe_chunks(blocks(), encoding)
+    )
+    return n_tokens, n_bytes
+
+
+def count_file(path: Path, encoding: str) -> tuple[int, int] | None:
+    """Count `encoding` tokens in the file at `path`.
+
+    Returns:
+        Tuple of number of tokens and number of bytes, or None if the file is binary.
+    """
+    with path.open("rb") as f:
+        if b"\0" in f.read(_BINARY_CHECK_SIZE):
+            return None
+        f.seek(0)
+        return count_tokens(f, encoding)
+
+
+def _new_hash() -> "hashlib.blake2b":
+    return hashlib.blake2b(digest_size=16)
+
+
+def digest_file(path: Path) -> bytes | None:
+    """Hash the contents of the file at `path`, or return None if it's binary."""
+    with path.open("rb") as f:
+        if b"\0" in f.read(_BINARY_CHECK_SIZE):
+            return None
+        f.seek(0)
+        return hashlib.file_digest(f, _new_hash).digest()
+
+
+class TokenCache:
+    """On-disk cache of token counts, keyed by content hash and encoding name.
+
+    Entries are evicted in least recently used order when there are more than
+    `max_entries`. Keeps track of the number of hits and misses, both for this instance
+    and across all runs.
+    """
+
+    def __init__(self, path: Path, max_entries: int = _CACHE_MAX_ENTRIES) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(path)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS counts (
+                digest BLOB NOT NULL,
+                encoding TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, encoding)
+            );
+            CREATE INDEX IF NOT EXISTS counts_last_used ON counts (last_used);
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0);
+            """
+        )
+
+    @classmethod
+    def default(cls) -> Self:
+        """Open the cache in the user cache directory."""
+        cache_home = Path(os.environ.get("XDG_CACHE_HOME") or "~/.cache").expanduser()
+        return cls(cache_home / "scripts" / "ntok.sqlite")
+
+    def get(self, digest: bytes, encoding: str) -> tuple[int, int] | None:
+        """Get number of tokens and bytes for the content with `digest`, if cached."""
+        row = self._db.execute(
+            "SELECT tokens, bytes FROM counts WHERE digest = ? AND encoding = ?",
+            (digest, encoding),
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._db.execute(
+            "UPDATE counts SET last_used = ? WHERE digest = ? AND encoding = ?",
+            (time.time(), digest, encoding),
+        )
+        return row
+
+    def put(self, digest: bytes, encoding: str, tokens: int, n_bytes: int) -> None:
+        """Store number of `tokens` and `n_bytes` for the content with `digest`."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO counts VALUES (?, ?, ?, ?, ?)",
+            (digest, encoding, tokens, n_bytes, time.time()),
+        )
+
+    def lifetime_stats(self) -> tuple[int, int]:
+        """Number of hits and misses across all runs, including this one."""
+        stats = dict(self._db.execute("SELECT name, value FROM stats"))
+        return stats["hits"] + self.hits, stats["misses"] + self.misses
+
+    def close(self) -> None:
+        """Evict the least recently used entries, save the stats and close the cache."""
+        with self._db:
+            self._db.execute(
+                "DELETE FROM counts WHERE rowid IN (SELECT rowid FROM counts"
+                " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.executemany(
+                "UPDATE stats SET value = value + ? WHERE name = ?",
+                [(self.hits, "hits"), (self.misses, "misses")],
+            )
+        self._db.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+def render_cache_stats(cache: TokenCache) -> str:
+    """Render hit and miss rates for this run and across all runs."""
+
+    def rates(hits: int, misses: int) -> str:
+        total = max(hits + misses, 1)
+        return (
+            f"{hits} hits ({hits / total:.2%}), {misses} misses ({misses / total:.2%})"
+        )
+
+    return "\n".join(
+        [
+            f"Cache: {cache.path}",
+            f"This run: {rates(cache.hits, cache.misses)}",
+            f"All runs: {rates(*cache.lifetime_stats())}",
+        ]
+    )
+
+
+def _gitignored(root: Path, paths: list[Path]) -> set[Path]:
+    """Find which `paths` are ignored by git in the repository that contains `root`.
+
+    If `root` isn't inside a git repository or git isn't available, nothing is ignored.
+    """
+    if not paths:
+        return set()
+
+    absolute = {str(path.resolve()): path for path in paths}
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(root), "check-ignore", "--stdin", "-z"],
+            input="\0".join(absolute),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except FileNotFoundError:
+        return set()
+
+    # 0: some paths are ignored, 1: none are, 128: fatal error (e.g. not a repository).
+    if result.returncode != 0:
+        return set()
+    return {absolute[path] for path in result.stdout.split("\0") if path}
+
+
+def expand_paths(inputs: Iterable[Path], gitignore: bool) -> list[Path]:
+    """Expand directories (recursively) and glob patterns in `inputs` into files.
+
+    Files given explicitly are always kept. Files found in directories or by globs
+    are skipped if they're inside a `.git` directory or, if `gitignore` is set, are
+    ignored by git.
+
+    Raises:
+        typer.BadParameter: if an input doesn't exist and doesn't match any files.
+    """
+    files: list[Path] = []
+
+    for path in inputs:
+        if path.is_file():
+            files.append(path)
+            continue
+
+        if path.is_dir():
+            root = path
+            found = [p for p in path.rglob("*") if p.is_file()]
+        elif matches := glob.glob(str(path), recursive=True):
+            root = Path()
+            found = [
+                file
+                for match in map(Path, matches)
+                for file in (match.rglob("*") if match.is_dir() else [match])
+                if file.is_file()
+            ]
+        else:
+            raise typer.BadParameter(f"No such file, directory or pattern: {path}")
+
+        found = [p for p in found if ".git" not in p.parts]
+        if gitignore:
+            ignored = _gitignored(root, found)
+            found = [p for p in found if p not in ignored]
+        files.extend(sorted(found))
+
+    return list(dict.fromkeys(files))
+
+
+def _parallel_map[T, R](
+    func: Callable[[T], R], items: list[T], jobs: int | None, threads: bool = False
+) -> list[R]:
+    """Apply `func` to `items` using a pool of `jobs` processes, keeping the order.
+
+    If `jobs` is None, use one process per CPU. Runs in this process if there's only one
+    item or `jobs` is 1. If `threads` is True, use a thread pool instead, which works
+    for tokenising because tiktoken releases the GIL.
+    """
+    if len(items) <= 1 or jobs == 1:
+        return list(map(func, items))
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if threads:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(func, items))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        chunksize = max(1, len(items) // ((jobs or os.cpu_count() or 1) * 4))
+        return list(pool.map(func, items, chunksize=chunksize))
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """Handle a single request from `scripts.ntok_client.query_daemon`."""
+
+    def handle(self) -> None:
+        request = marshal.load(self.rfile)
+        encoding: str = request["encoding"]
+
+        try:
+            if request["stdin"]:
+                results = [count_tokens(cast(IO[bytes], self.rfile), encoding)]
+            else:
+                count = functools.partial(count_file, encoding=encoding)
+                paths = [Path(path) for path in request["paths"]]
+                results = _parallel_map(count, paths, jobs=None, threads=True)
+            response = {"results": results}
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+
+        self.wfile.write(marshal.dumps(response))
+
+
+def serve_daemon(encodings: list[str]) -> None:
+    """Load `encodings` and serve requests from `query_daemon` until interrupted.
+
+    The socket's directory is created only accessible by the user, and the socket is
+    created with a umask that keeps it private. Stops on SIGINT (Ctrl-C) or SIGTERM,
+    removing the socket.
+
+    Raises:
+        SystemExit: if another daemon is already listening on the socket, or its
+            directory belongs to another user or can be accessed by others.
+    """
+    socket_path = Path(daemon_socket_path())
+    socket_path.parent.mkdir(mode=0o700, exist_ok=True)
+    directory = socket_path.parent.stat()
+    if directory.st_uid != os.getuid() or directory.st_mode & 0o077:
+        sys.exit(
+            f"{socket_path.parent} must belong to you and only be accessible by you."
+        )
+    if socket_path.exists():
+        if query_daemon(DEFAULT_ENCODING) is not None:
+            sys.exit(f"Daemon already running on {socket_path}.")
+        socket_path.unlink()
+
+    for name in encodings:
+        _encoding(name)
+
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(
+            str(socket_path), _DaemonHandler
+        )
+    finally:
+        os.umask(umask)
+    with server:
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        print(f"Listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def _count_uncached(
+    paths: list[Path], encoding: str, jobs: int | None, daemon: bool
+) -> list[tuple[int, int] | None]:
+    """Count tokens in `paths` with the daemon, or in a process pool as a fallback."""
+    if daemon and paths and (results := query_daemon(encoding, paths)) is not None:
+        return results
+
+    count = functools.partial(count_file, encoding=encoding)
+    return _parallel_map(count, paths, jobs)
+
+
+def count_files(
+    paths: list[Path],
+    encoding: str,
+    jobs: int | None,
+    cache: TokenCache | None,
+    daemon: bool,
+) -> list[tuple[int, int] | None]:
+    """Count `encoding` tokens in each of `paths` using a pool of `jobs` processes.
+
+    The tokeniser is loaded at most once per worker process. If `cache` is given, the
+    files are hashed first and only the ones that miss the cache are counted, so the
+    tokeniser isn't loaded at all if every file is cached. If `daemon` is True and the
+    daemon is running, the files are counted there instead of in the process pool.
+
+    Returns:
+        Result of `count_file` for each path, in the same order.
+    """
+    if cache is None:
+        return _count_uncached(paths, encoding, jobs, daemon)
+
+    digests = _parallel_map(digest_file, paths, jobs)
+    results: list[tuple[int, int] | None] = [None] * len(paths)
+    misses: list[int] = []
+
+    for i, digest in enumerate(digests):
+        if digest is None:
+            continue
+        if (cached := cache.get(digest, encoding)) is not None:
+            results[i] = cached
+        else:
+            misses.append(i)
+
+    counted = _count_uncached([paths[i] for i in misses], encoding, jobs, daemon)
+    for i, result in zip(misses, counted):
+        results[i] = result
+        if result is not None and (digest := digests[i]) is not None:
+            cache.put(digest, encoding, *result)
+
+    return results
+
+
+def count_stdin(
+    encoding: str, cache: TokenCache | None, daemon: bool
+) -> tuple[int, int]:
+    """Count `encoding` tokens in stdin, using `cache` and the daemon if given.
+
+    To look up the cache, stdin is hashed while being spooled to a temporary file,
+    which is kept in memory if small enough. The spooled content is sent to the daemon,
+    so it can still be counted in-process if the daemon fails.
+    """
+    if cache is None and not daemon:
+        return count_tokens(sys.stdin.buffer, encoding)
+
+    hasher = _new_hash()
+    with tempfile.SpooledTemporaryFile(max_size=16 * _CHUNK_SIZE) as spool:
+        while block := sys.stdin.buffer.read(_CHUNK_SIZE):
+            hasher.update(block)
+            spool.write(block)
+
+        digest = hasher.digest()
+        if cache is not None and (cached := cache.get(digest, encoding)) is not None:
+            return cached
+
+        spool.seek(0)
+        if daemon and (results := query_daemon(encoding, stdin=spool)) and results[0]:
+            result = results[0]
+        else:
+            spool.seek(0)
+            result = count_tokens(spool, encoding)
+
+    if cache is not None:
+        cache.put(digest, encoding, *result)
+    return result
+
+
+def _extension(path: Path) -> str:
+    return path.suffix or "no_extension"
+
+
+def render_counts(counts: dict[Path, int]) -> str:
+    """Render table with token count per file, subtotals per extension and total."""
+    count_width = max(len(f"{count:,}") for count in counts.values())
+    lines = [f"{count:>{count_width},}  {path}" for path, count in counts.items()]
+
+    ext_tokens: dict[str, int] = defaultdict(int)
+    ext_files: dict[str, int] = defaultdict(int)
+    for path, count in counts.items():
+        ext_tokens[_extension(path)] += count
+        ext_files[_extension(path)] += 1
+
+    ext_width = max(*(len(ext) for ext in ext_tokens), len("Extension"))
+    separator = "-" * (ext_width + 27)
+    lines.extend(
+        ["", f"{'Extension':<{ext_width}} {'Files':>10} {'Tokens':>15}", separator]
+    )
+    lines.extend(
+        f"{ext:<{ext_width}} {ext_files[ext]:>10,} {tokens:>15,}"
+        for ext, tokens in sorted(ext_tokens.items(), key=lambda x: x[1], reverse=True)
+    )
+    lines.extend(
+        [
+            separator,
+            f"{'TOTAL':<{ext_width}} {len(counts):>10,} {sum(counts.values()):>15,}",
+        ]
+    )
+
+    return "\n".join(lines)
+
+
+@dataclass
+class TokenStats:
+    """Distribution of token counts per record.
+
+    Stores how many records have each count, so memory depends on the number of
+    distinct counts instead of the number of records, and quantiles are exact. Records
+    without the text are counted in `missing` instead, and `bytes` is the size of the
+    text in UTF-8.
+    """
+
+    freqs: Counter[int] = field(default_factory=Counter[int])
+    missing: int = 0
+    bytes: int = 0
+
+    def add(self, counts: Iterable[int]) -> None:
+        self.freqs.update(counts)
+
+    @property
+    def records(self) -> int:
+        return self.freqs.total()
+
+    @property
+    def tokens(self) -> int:
+        return sum(count * freq for count, freq in self.freqs.items())
+
+    def quantile(self, q: float) -> int:
+        """Smallest count such that at least a `q` fraction of records are at most it."""
+        threshold = q * self.records
+        seen = 0
+        for count in sorted(self.freqs):
+            seen += self.freqs[count]
+            if seen >= threshold:
+                return count
+        return 0
+
+    def above(self, limit: int) -> int:
+        """Number of records with more than `limit` tokens."""
+        return sum(freq for count, freq in self.freqs.items() if count > limit)
+
+    def histogram(self, bins: int) -> list[tuple[int, int, int]]:
+        """Number of records in `bins` equal-width ranges from min to max count.
+
+        Returns:
+            List of (start, end, records) for each range, where `end` is exclusive
+            except for the last range.
+        """
+        if not self.freqs:
+            return []
+
+        low, high = min(self.freqs), max(self.freqs)
+        width = max(1, -(-(high - low + 1) // bins))
+        edges = range(low, high + 1, width)
+        counts = [0] * len(edges)
+        for count, freq in self.freqs.items():
+            counts[(count - low) // width] += freq
+        return [(start, start + width, n) for start, n in zip(edges, counts)]
+
+
+def _field_text(record: Any, key: str) -> str | None:
+    """Text of `key` in `record`, or None if it's missing or null.
+
+    Non-string values are tokenised as JSON.
+    """
+    if not isinstance(record, dict):
+        return None
+    value = cast(dict[str, Any], record).get(key)
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def count_json_fields(
+    records: Iterable[Any],
+    keys: list[str],
+    encoding: str,
+    threads: int | None,
+    batch_size: int = _JSON_BATCH_SIZE,
+) -> tuple[dict[str, TokenStats], TokenStats]:
+    """Count `encoding` tokens in the `keys` fields of each record.
+
+    Records are tokenised in batches of `batch_size` with tiktoken's multithreaded
+    batch encoding, using `threads` threads (or one per CPU if None). Records where a
+    key is missing or null are left out of its statistics and counted as missing, and
+    records missing every key are left out of the totals.
+
+    Returns:
+        Tuple of the statistics for each key and for the sum of all keys in each record.
+    """
+    tokeniser = _encoding(encoding)
+    num_threads = threads or os.cpu_count() or 1
+    field_stats = {key: TokenStats() for key in keys}
+    record_stats = TokenStats()
+
+    for batch in itertools.batched(records, batch_size):
+        totals: list[int | None] = [None] * len(batch)
+        for key in keys:
+            stats = field_stats[key]
+            texts = {
+                i: text
+                for i, record in enumerate(batch)
+                if (text := _field_text(record, key)) is not None
+            }
+            tokens = tokeniser.encode_ordinary_batch(
+                list(texts.values()), num_threads=num_threads
+            )
+            counts = [len(text_tokens) for text_tokens in tokens]
+            stats.add(counts)
+            stats.missing += len(batch) - len(texts)
+            stats.bytes += sum(len(text.encode()) for text in texts.values())
+            for i, count in zip(texts, counts):
+                totals[i] = (totals[i] or 0) + count
+
+        present = [total for total in totals if total is not None]
+        record_stats.add(present)
+        record_stats.missing += len(batch) - len(present)
+
+    record_stats.bytes = sum(stats.bytes for stats in field_stats.values())
+    return field_stats, record_stats
+
+
+def _iter_records(paths: list[Path]) -> Iterator[Any]:
+    """Iterate over the records in JSON files `paths`, or stdin if empty."""
+    for path in paths or [Path("-")]:
+        yield from read_json(path)
+
+
+def render_json_stats(
+    field_stats: dict[str, TokenStats],
+    record_stats: TokenStats,
+    bins: int,
+    context_limit: int | None,
+) -> str:
+    """Render table with statistics per field, histogram and records over the limit."""
+    rows = dict(field_stats)
+    if len(field_stats) > 1:
+        rows["(all fields)"] = record_stats
+
+    headers = [
+        "Field",
+        "Records",
+        "Missing",
+        "Min",
+        "Mean",
+        "p50",
+        "p95",
+        "p99",
+        "Max",
+        "Total",
+    ]
+    values = [
+        [
+            name,
+            f"{stats.records:,}",
+            f"{stats.missing:,}",
+            f"{stats.quantile(0):,}",
+            f"{stats.tokens / max(stats.records, 1):,.1f}",
+            f"{stats.quantile(0.5):,}",
+            f"{stats.quantile(0.95):,}",
+            f"{stats.quantile(0.99):,}",
+            f"{stats.quantile(1):,}",
+            f"{stats.tokens:,}",
+        ]
+        for name, stats in rows.items()
+    ]
+    widths = [
+        max(len(row[i]) for row in [headers, *values]) for i in range(len(headers))
+    ]
+    lines = [
+        "  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in [headers, *values]
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+
+    if histogram := record_stats.histogram(bins):
+        lines.extend(["", "Tokens per record:"])
+        max_count = max(n for _, _, n in histogram)
+        range_width = len(f"{histogram[-1][1]:,}")
+        for start, end, n in histogram:
+            bar = "█" * round(40 * n / max(max_count, 1))
+            lines.append(
+                f"{start:>{range_width},} - {end:>{range_width},} | {bar} {n:,}"
+            )
+
+    if context_limit is not None:
+        above = record_stats.above(context_limit)
+        ratio = above / max(record_stats.records, 1)
+        lines.extend(
+            ["", f"Records over {context_limit:,} tokens: {above:,} ({ratio:.2%})"]
+        )
+
+    return "\n".join(lines)
+
+
+def print_throughput(n_bytes: int, n_tokens: int, start: float) -> None:
+    """Print MB/s and tokens/s since `start` (from `time.perf_counter`) to stderr."""
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(
+        f"{n_bytes / 1e6:.2f} MB in {elapsed:.2f}s:"
+        f" {n_bytes / 1e6 / elapsed:.2f} MB/s, {n_tokens / elapsed:,.0f} tokens/s",
+        file=sys.stderr,
+    )
+
+
 @app.command(help=__doc__)
+@profiling.profiled
 def calculate(
-    file: Annotated[
-        Path | None,
-        typer.Argument(help="Path to the file. If not provided, use stdin."),
+    files: Annotated[
+        list[Path] | None,
+        typer.Argument(
+            help="Files, directories or glob patterns. If not provided, use stdin.",
+            show_default=False,
+        ),
     ] = None,
+    encoding: Annotated[
+        str,
+        typer.Option("--encoding", "-e", help="Name of the tiktoken encoding."),
+    ] = DEFAULT_ENCODING,
+    jobs: Annotated[
+        int | None,
+        typer.Option(
+            "--jobs",
+            "-j",
+            help="Number of worker processes. Defaults to the number of CPUs.",
+        ),
+    ] = None,
+    gitignore: Annotated[
+        bool,
+        typer.Option(
+            "--gitignore",
+            "-g",
+            help="Skip files in directories and globs that are ignored by git.",
+        ),
+    ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Don't read or write the token count cache."),
+    ] = False,
+    stats: Annotated[
+        bool,
+        typer.Option("--stats", help="Print cache hit and miss rates to stderr."),
+    ] = False,
+    daemon: Annotated[
+        bool,
+        typer.Option(
+            "--daemon/--no-daemon", help="Count with the daemon if it's running."
+        ),
+    ] = True,
+    json_field: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--json-field",
+            "-f",
+            help="Count tokens per record in this field of a JSON dataset. Repeatable.",
+            show_default=False,
+        ),
+    ] = None,
+    context_limit: Annotated[
+        int | None,
+        typer.Option(
+            "--context-limit",
+            "-l",
+            help="With --json-field, count the records with more tokens than this.",
+        ),
+    ] = None,
+    bins: Annotated[
+        int,
+        typer.Option("--bins", help="With --json-field, number of histogram bins."),
+    ] = 10,
+    serve: Annotated[
+        bool,
+        typer.Option(
+            "--serve",
+            help="Run the daemon in the foreground, preloading the encoding.",
+        ),
+    ] = False,
+    throughput: Annotated[
+        bool,
+        typer.Option(
+            "--throughput",
+            "-t",
+            help="Print the throughput (MB/s, tokens/s) to stderr. With --json-field,"
+            " the MB are of the fields' text.",
+        ),
+    ] = False,
 ):
-    if file is None:
-        text = sys.stdin.read()
+    if serve:
+        serve_daemon([encoding])
+        return
+
+    start = time.perf_counter()
+
+    if json_field:
+        paths = expand_paths(files or [], gitignore)
+        field_stats, record_stats = count_json_fields(
+            _iter_records(paths), json_field, encoding, jobs
+        )
+        print(render_json_stats(field_stats, record_stats, bins, context_limit))
+        if throughput:
+            print_throughput(record_stats.bytes, record_stats.tokens, start)
+        return
+
+    cache = None if no_cache else TokenCache.default()
+    daemon = daemon and os.path.exists(daemon_socket_path())
+
+    if not files:
+        with profiling.phase("tokenise") as phase:
+            n_tokens, n_bytes = count_stdin(encoding, cache, daemon)
+            phase.bytes += n_bytes
+        print(n_tokens)
     else:
-        text = file.read_text()
+        paths = expand_paths(files, gitignore)
+        with profiling.phase("tokenise") as phase:
+            results = count_files(paths, encoding, jobs, cache, daemon)
+            phase.records += len(paths)
+            phase.bytes += sum(result[1] for result in results if result is not None)
+        counts = {
+            path: result[0]
+            for path, result in zip(paths, results)
+            if result is not None
+        }
+        n_tokens = sum(counts.values())
+        n_bytes = sum(result[1] for result in results if result is not None)
+
+        if len(files) == 1 and files[0].is_file():
+            print(n_tokens)
+        elif counts:
+            print(render_counts(counts))
+        else:
+            print("No text files found.", file=sys.stderr)
+
+        if skipped := len(paths) - len(counts):
+            print(f"Skipped {skipped} binary file(s).", file=sys.stderr)
 
-    tokens = _GPT_TOKENISER.encode(text)
+    if cache is not None:
+        if stats:
+            print(render_cache_stats(cache), file=sys.stderr)
+        cache.close()
 
-    print(len(tokens))
+    if throughput:
+        print_throughput(n_bytes, n_tokens, start)
 
 
 if __name__ == "__main__":
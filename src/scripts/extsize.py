@@ -7,6 +7,8 @@ from typing import Annotated
 
 import typer
 
+from scripts import profiling
+
 
 def get_size_by_extension(root_dir: Path) -> tuple[dict[str, int], dict[str, int]]:
     """Find total size and count of files per extension in bytes.
@@ -59,13 +61,17 @@ app = typer.Typer(
 
 
 @app.command(help=__doc__)
+@profiling.profiled
 def main(
     root_dir: Annotated[
         Path, typer.Argument(help="Starting directory to find files.")
     ] = Path(),
 ) -> None:
     """Show sum of space and number of files per extension."""
-    ext_sizes, ext_counts = get_size_by_extension(root_dir)
+    with profiling.phase("scan") as phase:
+        ext_sizes, ext_counts = get_size_by_extension(root_dir)
+        phase.records += sum(ext_counts.values())
+        phase.bytes += sum(ext_sizes.values())
 
     # Sort extensions by size
     sorted_exts = sorted(ext_sizes.items(), key=lambda x: x[1], reverse=True)
@@ -1,47 +1,441 @@
-"""Get schema from JSON file, including nested structures."""
+"""Get schema from JSON file, including nested structures.
 
-import argparse
+The schema of a list is the sorted list of the distinct schemas of its items. Records
+with the same shape share a single schema node, so the memory used depends on the
+number of distinct shapes, not on the size of the data.
+
+The input can be a JSON array or JSON Lines, which is treated as an array of its
+records. Either way, it's streamed item by item, so it's never fully loaded in memory.
+Other JSON documents (e.g. a single object) are loaded whole. Files compressed with gzip,
+bzip2 or Zstandard are decompressed as they're read.
+
+Many inputs (files, directories and glob patterns) can be given. Each file is read by a
+worker process, and their schemas are merged into a single schema of all the records.
+With `--counts`, each field is also annotated with the number of records where it
+appears and whether it's nullable (null or missing in some records).
+
+With `--sample N`, the schema is inferred from N records sampled uniformly from all the
+inputs, in a single pass and keeping only N records in memory. A report with the number
+of distinct shapes in the sample and the fields that are rare in it is printed to
+stderr, to help decide if the sample is representative enough.
+"""
+
+import itertools
 import json
+import random
+import sys
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
 
-from scripts.util import HelpOnErrorArgumentParser
+from scripts import profiling
+from scripts.util import (
+    JSON_SUFFIXES,
+    HelpOnErrorArgumentParser,
+    find_files,
+    iter_json,
+    loads,
+    open_json,
+    read_json,
+    reservoir_sample,
+)
 
 type Json = float | int | str | bool | None | list[Json] | dict[str, Json]
 
+# Interned schema nodes. Scalars are their type name, lists are the set of their item
+# schemas and objects are their (key, schema) pairs in order. Children are referred to
+# by their id, so nodes are hashed and compared without recursing into them.
+type SchemaKey = (
+    str | tuple[str, frozenset[int]] | tuple[str, tuple[tuple[str, int], ...]]
+)
+
+# Bytes read at a time from the start of the input to check its format.
+_HEAD_SIZE = 4096
+
+_SCALAR_NAMES: dict[type, str] = {
+    bool: "bool",
+    int: "int",
+    float: "float",
+    str: "string",
+    type(None): "null",
+}
+
+
+class SchemaBuilder:
+    """Builds schemas as interned nodes, referred to by integer ids.
+
+    Identical schemas always get the same id, so a union of schemas is a set of ids and
+    folding a value into it only costs memory if its shape wasn't seen before.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[SchemaKey, int] = {}
+        self._nodes: list[SchemaKey] = []
+        self._scalars = {
+            type_: self._intern(name) for type_, name in _SCALAR_NAMES.items()
+        }
+        self._null = self._scalars[type(None)]
+        self._paths: dict[int, dict[str, bool]] = {}
+
+    def _intern(self, key: SchemaKey) -> int:
+        if (id_ := self._ids.get(key)) is None:
+            id_ = self._ids[key] = len(self._nodes)
+            self._nodes.append(key)
+        return id_
+
+    def schema(self, value: Json) -> int:
+        """Get the id of the schema of `value`."""
+        if (id_ := self._scalars.get(type(value))) is not None:
+            return id_
+        schema = self.schema
+        if isinstance(value, dict):
+            return self._intern(
+                ("dict", tuple([(key, schema(val)) for key, val in value.items()]))
+            )
+        if isinstance(value, list):
+            return self._intern(("list", frozenset([schema(item) for item in value])))
+        raise TypeError(f"Unsupported JSON value: {value!r}")
+
+    def union(self, ids: Iterable[int]) -> int:
+        """Get the id of the schema of a list whose items have the schemas `ids`."""
+        return self._intern(("list", frozenset(ids)))
+
+    def merge(self, other: "SchemaBuilder") -> list[int]:
+        """Intern the nodes of `other` in this builder.
+
+        Returns:
+            The id in this builder of each node of `other`, indexed by its id there.
+        """
+        ids: list[int] = []
+        # Children are always interned before their parents, so their new ids are known.
+        for node in other._nodes:
+            match node:
+                case ("list", frozenset() as items):
+                    new = ("list", frozenset(ids[item] for item in items))
+                case ("dict", tuple() as fields):
+                    new = ("dict", tuple((key, ids[val]) for key, val in fields))
+                case _:
+                    new = node
+            ids.append(self._intern(new))
+        return ids
+
+    def field_paths(self, id_: int) -> dict[str, bool]:
+        """Get the paths of the fields inside the node `id_`.
+
+        Object fields are separated by `.` and list items are `[]`, e.g. `a.b[].c`.
+
+        Returns:
+            Map of each path to whether it can be null or missing in a value with this
+            schema, e.g. because only some of the items of a list have it.
+        """
+        if id_ in self._paths:
+            return self._paths[id_]
 
-def merge_schemas(schemas: list[Json]) -> list[Json]:
-    str_schemas = {json.dumps(schema) for schema in schemas}
-    return sorted([json.loads(schema) for schema in str_schemas], key=str)
+        paths: dict[str, bool] = {}
+        match self._nodes[id_]:
+            case ("dict", tuple() as fields):
+                for key, val in fields:
+                    paths[key] = val == self._null
+                    for path, nullable in self.field_paths(val).items():
+                        paths[_join_path(key, path)] = nullable
+            case ("list", frozenset() as items) if items:
+                paths["[]"] = self._null in items
+                item_paths = [self.field_paths(item) for item in items]
+                for path in set[str]().union(*item_paths):
+                    paths[_join_path("[]", path)] = any(
+                        item.get(path, True) for item in item_paths
+                    )
+            case _:
+                pass
+
+        self._paths[id_] = paths
+        return paths
+
+    def to_json(self, id_: int) -> Json:
+        """Convert the schema node `id_` to its JSON representation."""
+        match self._nodes[id_]:
+            case str(name):
+                return name
+            case ("list", frozenset() as items):
+                return sorted((self.to_json(item) for item in items), key=str)
+            case ("dict", tuple() as fields):
+                return {key: self.to_json(val) for key, val in fields}
+            case node:
+                raise AssertionError(f"Invalid schema node: {node!r}")
+
+
+def _join_path(parent: str, child: str) -> str:
+    return f"{parent}{child}" if child.startswith("[") else f"{parent}.{child}"
+
+
+def _parent_path(path: str) -> str:
+    return path.removesuffix("[]") if path.endswith("[]") else path.rpartition(".")[0]
+
+
+@dataclass
+class RecordShapes:
+    """Number of records of each distinct shape, mergeable across inputs.
+
+    Attributes:
+        builder: Builder with the schema nodes of the records.
+        counts: Number of records with each schema node id.
+        single_value: Whether the records come from a single input that isn't an array
+            or JSON Lines with many values, which is then the value itself.
+    """
+
+    builder: SchemaBuilder = field(default_factory=SchemaBuilder)
+    counts: Counter[int] = field(default_factory=Counter[int])
+    single_value: bool = False
+
+    def add(self, record: Json) -> None:
+        self.counts[self.builder.schema(record)] += 1
+
+    def update(self, other: "RecordShapes") -> None:
+        """Merge the records of `other` into these. Merging is associative."""
+        ids = self.builder.merge(other.builder)
+        for id_, count in other.counts.items():
+            self.counts[ids[id_]] += count
+        self.single_value = False
+
+    def records(self) -> int:
+        return self.counts.total()
+
+    def schema(self) -> Json:
+        """Schema of the records: a list schema, unless it's a single value."""
+        if self.single_value:
+            return self.builder.to_json(next(iter(self.counts)))
+        return self.builder.to_json(self.builder.union(self.counts))
+
+    def field_counts(self) -> dict[str, dict[str, Any]]:
+        """Number of records with each field and whether it's nullable, by path."""
+        counts: Counter[str] = Counter()
+        nullable: set[str] = set()
+        for id_, count in self.counts.items():
+            for path, null in self.builder.field_paths(id_).items():
+                counts[path] += count
+                if null:
+                    nullable.add(path)
+
+        # A field is also nullable if it's missing in some records with its parent.
+        total = self.records()
+        return {
+            path: {
+                "count": count,
+                "nullable": path in nullable
+                or count
+                < (counts[parent] if (parent := _parent_path(path)) else total),
+            }
+            for path, count in sorted(counts.items())
+        }
 
 
 def get_schema(data: Json) -> Json:
-    match data:
-        case bool():
-            return "bool"
-        case int():
-            return "int"
-        case float():
-            return "float"
-        case str():
-            return "string"
-        case None:
-            return "null"
-        case list(items):
-            return merge_schemas([get_schema(item) for item in items])
-        case dict(d):
-            return {key: get_schema(value) for key, value in d.items()}
+    """Get the schema of a JSON value."""
+    builder = SchemaBuilder()
+    return builder.to_json(builder.schema(data))
+
+
+def read_records(file: IO[bytes]) -> RecordShapes:
+    """Get the shapes of the records of a JSON or JSON Lines file, streaming them.
+
+    The records are the items of an array or the values of a JSON Lines file. Any other
+    document (or JSON Lines with one value) is a single value. The format is checked on
+    the start of the input, up to the end of the first line if it doesn't start with
+    `[`, so the file doesn't need to seek.
+    """
+    head = file.read(_HEAD_SIZE)
+    while not (text := head.removeprefix(b"\xef\xbb\xbf").lstrip()) and (
+        chunk := file.read(_HEAD_SIZE)
+    ):
+        head += chunk
+    is_array = text[:1] == b"["
+
+    shapes = RecordShapes()
+    if not is_array:
+        while b"\n" not in text and (chunk := file.read(_HEAD_SIZE)):
+            head += chunk
+            text += chunk
+        # JSON Lines have a whole value on each line. Otherwise, it's a single
+        # document spanning several lines, e.g. a pretty-printed object.
+        try:
+            json.loads(text.split(b"\n", 1)[0])
+        except ValueError:
+            shapes.add(loads(head + file.read()))
+            shapes.single_value = True
+            return shapes
+
+    for item in iter_json(file, head=head):
+        shapes.add(item)
+    shapes.single_value = not is_array and shapes.records() == 1
+    return shapes
+
+
+def read_path(path: Path) -> RecordShapes:
+    """Get the shapes of the records of a file, or stdin if `path` is `-`."""
+    with open_json(path) as file:
+        return read_records(file)
+
+
+def merge_paths(paths: list[Path], jobs: int | None) -> RecordShapes:
+    """Get the shapes of the records of all `paths`, reading each in a worker process.
+
+    The result doesn't depend on the number of workers or the order of the files.
+    """
+    if len(paths) == 1 or jobs == 1:
+        results = map(read_path, paths)
+        return _merge_all(results)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return _merge_all(pool.map(read_path, paths))
+
+
+def _merge_all(results: Iterable[RecordShapes]) -> RecordShapes:
+    merged: RecordShapes | None = None
+    for shapes in results:
+        if merged is None:
+            merged = shapes
+        else:
+            merged.update(shapes)
+    return merged or RecordShapes()
+
+
+def sample_paths(paths: list[Path], k: int, seed: int) -> tuple[RecordShapes, int]:
+    """Get the shapes of `k` records sampled uniformly from all `paths`.
+
+    Only the sampled records have their shapes computed, the others are only parsed.
+
+    Returns:
+        The shapes of the sampled records and the total number of records.
+    """
+    records = itertools.chain.from_iterable(map(read_json, paths))
+    # Count the records as they're consumed by the sampler.
+    counter = itertools.count()
+    sample = reservoir_sample(
+        (record for record, _ in zip(records, counter, strict=False)),
+        k,
+        random.Random(seed),
+    )
+
+    shapes = RecordShapes()
+    for record in sample:
+        shapes.add(record)
+    return shapes, next(counter)
+
+
+def render_coverage(shapes: RecordShapes, total: int, rare: float) -> str:
+    """Describe how varied the sampled records are and which fields are rare in them."""
+    sampled = shapes.records()
+    once = sum(count == 1 for count in shapes.counts.values())
+    summary = (
+        f"Sampled {sampled:,} of {total:,} records, with {len(shapes.counts):,}"
+        f" distinct shapes ({once:,} seen only once)."
+    )
+    lines = [summary]
+
+    rare_fields = {
+        path: info["count"]
+        for path, info in shapes.field_counts().items()
+        if info["count"] < rare * sampled
+    }
+    if rare_fields:
+        lines.append(f"Fields in less than {rare:.1%} of the sampled records:")
+        lines.extend(
+            f"  {path}: {count:,} ({count / sampled:.2%})"
+            for path, count in rare_fields.items()
+        )
+    return "\n".join(lines)
 
 
 def main() -> None:
     parser = HelpOnErrorArgumentParser(__doc__)
-    parser.add_argument("input", type=argparse.FileType(), help="Input JSON data file")
     parser.add_argument(
-        "output", type=argparse.FileType("w"), help="Output JSON schema file"
+        "inputs",
+        nargs="+",
+        metavar="input",
+        help="Input JSON data files, directories or glob patterns, or - for stdin",
+    )
+    parser.add_argument("output", help="Output JSON schema file, or - for stdout")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=None,
+        help="Number of worker processes, or one per CPU if not set. Can't be used"
+        " with --sample, which reads the inputs in a single pass",
+    )
+    parser.add_argument(
+        "--counts",
+        "-c",
+        action="store_true",
+        help="Annotate each field with its number of records and nullability",
+    )
+    parser.add_argument(
+        "--sample",
+        "-n",
+        type=int,
+        metavar="N",
+        help="Infer the schema from a uniform sample of N records",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Random seed used for sampling"
+    )
+    parser.add_argument(
+        "--rare",
+        type=float,
+        default=0.01,
+        help="Report fields in less than this fraction of the sampled records",
     )
     args = parser.parse_args()
 
-    data = json.load(args.input)
-    schema = get_schema(data)
-    args.output.write(json.dumps(schema, indent=2))
+    if "-" in args.inputs:
+        if len(args.inputs) > 1:
+            parser.error("stdin (-) can't be used with other inputs")
+        paths = [Path("-")]
+    else:
+        try:
+            paths = find_files(args.inputs, JSON_SUFFIXES)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+        if not paths:
+            parser.error("No JSON files found in the inputs")
+
+    if args.sample is not None:
+        if args.sample <= 0:
+            parser.error("--sample must be positive")
+        if args.jobs is not None:
+            parser.error("--jobs can't be used with --sample")
+
+    # Merging includes reading the files, in worker processes unless there's one.
+    with profiling.phase("merge") as phase:
+        if args.sample is None:
+            shapes = merge_paths(paths, args.jobs)
+            total = shapes.records()
+        else:
+            shapes, total = sample_paths(paths, args.sample, args.seed)
+        phase.records += total
+        phase.bytes += sum(path.stat().st_size for path in paths if path != Path("-"))
+    if args.sample is not None:
+        print(render_coverage(shapes, total, args.rare), file=sys.stderr)
+
+    with profiling.phase("render") as phase:
+        output: Any = shapes.schema()
+        if args.counts:
+            output = {
+                "records": shapes.records(),
+                "schema": output,
+                "fields": shapes.field_counts(),
+            }
+
+        text = json.dumps(output, indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            Path(args.output).write_text(text)
+        phase.bytes += len(text)
 
 
 if __name__ == "__main__":
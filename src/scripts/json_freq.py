@@ -1,13 +1,65 @@
-"""Analyse JSON data to count occurrences of values for a specified key."""
+"""Analyse JSON data to count occurrences of values for the specified keys.
 
+The input can be a JSON array or JSON Lines, optionally compressed with gzip, bzip2 or
+Zstandard, and it's read as a stream. Several keys are counted in the same pass. Several
+files (including directories and glob patterns) can be counted in parallel with
+`--jobs`, and their counts are merged in the order of the files, so the output doesn't
+depend on it. By default, exact counts use a single process, since sending the counters
+back from the workers can take longer than counting, and `--approx` and `--numeric` use
+one process per CPU.
+
+Example:
+
+    $ jfreq data.json label                  # values of 'label'
+    $ jfreq logs/*.jsonl -K user -K status   # values of 'user' and 'status'
+
+With `--approx`, memory is fixed regardless of the number of distinct values. The most
+frequent values are counted with the Space-Saving algorithm, using `--capacity`
+counters: each count is over the true count by at most its error, which is at most the
+number of objects divided by the capacity. The number of distinct values is estimated
+with HyperLogLog, with a relative error of about 1.04 / sqrt(2 ** precision).
+
+With `--numeric`, the numbers of each key are summarised instead: count, mean, standard
+deviation, minimum, maximum, quantiles and a histogram with `--bins` bins of the same
+width, or log-spaced with `--log-bins`. Values that aren't finite numbers are skipped,
+including integers too large for a float. The numbers are gathered in NumPy arrays, 8
+bytes per number, for exact quantiles. With `--approx`, quantiles come from a t-digest
+instead, and the histogram counts from its centroids, so memory is fixed.
+"""
+
+import hashlib
+import heapq
+import itertools
 import json
-import sys
+import math
 from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Annotated, Any, cast
+from typing import TYPE_CHECKING, Annotated, Any
 
 import typer
 
+from scripts import profiling
+from scripts.util import JSON_SUFFIXES, find_files, read_json
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import NDArray
+
+# Number of objects whose values are counted exactly before updating the sketches.
+_BATCH_SIZE = 4096
+
+# Quantiles shown with --numeric.
+_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# Compression of the t-digest: it keeps about half as many centroids.
+_TDIGEST_COMPRESSION = 200
+
+# Width of the longest bar of the histogram.
+_HISTOGRAM_WIDTH = 40
+
 app = typer.Typer(
     context_settings={"help_option_names": ["-h", "--help"]},
     add_completion=False,
@@ -17,53 +69,645 @@ app = typer.Typer(
 )
 
 
+class SpaceSaving:
+    """Approximate counts of the most frequent values, with a fixed number of counters.
+
+    When a new value arrives and all counters are used, the value with the lowest count
+    is replaced, and the new value inherits its count as the error. Counts are
+    overestimates by at most their error. Updates are weighted, so a batch of values
+    can be counted exactly first and added at once.
+
+    The counter with the lowest count is found with a heap whose entries are updated
+    lazily: counts only grow, so an outdated entry is pushed back with its current count
+    when it reaches the top.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counts: dict[Any, int] = {}
+        self.errors: dict[Any, int] = {}
+        # (count, insertion order, value). The order breaks ties, so values are never
+        # compared.
+        self._heap: list[tuple[int, int, Any]] = []
+        self._order = 0
+
+    def update(self, counts: Mapping[Any, int]) -> None:
+        """Add `counts` of values."""
+        for value, weight in counts.items():
+            if value in self.counts:
+                self.counts[value] += weight
+            elif len(self.counts) < self.capacity:
+                self._add(value, weight, 0)
+            else:
+                self._replace_min(value, weight)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """Add the counts of `other`, as if its values had been added to this one.
+
+        A value missing from a full summary might have been counted up to its lowest
+        count, so that's added to both the count and error of the value in the other
+        summary. The values with the highest counts are kept.
+        """
+        own_min = self._min_count()
+        other_min = other._min_count()
+        counts: Counter[Any] = Counter()
+        errors: Counter[Any] = Counter()
+
+        # In order of first appearance, which breaks ties between counts.
+        for value in dict.fromkeys(itertools.chain(self.counts, other.counts)):
+            for summary, missing in ((self, own_min), (other, other_min)):
+                counts[value] += summary.counts.get(value, missing)
+                errors[value] += summary.errors.get(value, missing)
+
+        top = sorted(counts, key=counts.__getitem__, reverse=True)
+        self.counts, self.errors, self._heap = {}, {}, []
+        for value in top[: self.capacity]:
+            self._add(value, counts[value], errors[value])
+
+    def _min_count(self) -> int:
+        """Highest count of a value that isn't in the summary."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def _add(self, value: Any, count: int, error: int) -> None:
+        self.counts[value] = count
+        self.errors[value] = error
+        self._order += 1
+        heapq.heappush(self._heap, (count, self._order, value))
+
+    def _replace_min(self, value: Any, weight: int) -> None:
+        while True:
+            count, _, old = self._heap[0]
+            if self.counts[old] == count:
+                break
+            self._order += 1
+            heapq.heapreplace(self._heap, (self.counts[old], self._order, old))
+
+        heapq.heappop(self._heap)
+        del self.counts[old], self.errors[old]
+        self._add(value, count + weight, count)
+
+    def most_common(self, n: int | None = None) -> list[tuple[Any, int, int]]:
+        """Most frequent values, as (value, count, error), highest count first."""
+        top = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [(value, count, self.errors[value]) for value, count in top[:n]]
+
+
+class HyperLogLog:
+    """Estimate of the number of distinct values, with `2 ** precision` registers."""
+
+    def __init__(self, precision: int = 14) -> None:
+        import numpy as np
+
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: Iterable[Any]) -> None:
+        """Add `values`, hashed by their `repr`."""
+        import numpy as np
+
+        digests = b"".join(
+            hashlib.blake2b(repr(value).encode(), digest_size=8).digest()
+            for value in values
+        )
+        hashes = np.frombuffer(digests, dtype=">u8")
+        rest_bits = 64 - self.precision
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+
+        # Position of the first 1 bit in the rest of the hash. Converting to float can
+        # round up to the next power of 2, which is too unlikely to matter.
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (rest_bits + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, hashes >> np.uint64(rest_bits), rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Add the values of `other`, which must have the same precision."""
+        import numpy as np
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        """Estimated number of distinct values added."""
+        import numpy as np
+
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.exp2(-self.registers.astype(np.float64)).sum()
+
+        # Small range correction: count empty registers instead (linear counting).
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return estimate
+
+
+class TDigest:
+    """Approximate distribution of numbers, as centroids with a mean and a weight.
+
+    Centroids are small near the extremes and large near the median, following the
+    arcsine scale function, so extreme quantiles are more accurate. New values and
+    other digests are merged in by sorting all centroids and values together and
+    grouping them again, which is done with NumPy.
+    """
+
+    def __init__(self, compression: float = _TDIGEST_COMPRESSION) -> None:
+        import numpy as np
+
+        self.compression = compression
+        self.means: NDArray[np.float64] = np.empty(0)
+        self.weights: NDArray[np.float64] = np.empty(0)
+
+    def update(self, values: "NDArray[np.float64]") -> None:
+        """Add `values`, each with weight 1."""
+        import numpy as np
+
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))]),
+        )
+
+    def merge(self, other: "TDigest") -> None:
+        """Add the centroids of `other`."""
+        import numpy as np
+
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _compress(
+        self, means: "NDArray[np.float64]", weights: "NDArray[np.float64]"
+    ) -> None:
+        import numpy as np
+
+        if not len(means):
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # Centroids whose starting quantile falls in the same unit of the scale
+        # function are grouped together.
+        cumulative = np.cumsum(weights)
+        start = (cumulative - weights) / cumulative[-1]
+        scale = self.compression / (2 * np.pi) * np.arcsin(2 * start - 1)
+        groups = np.floor(scale)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantiles(
+        self, qs: Iterable[float], low: float, high: float
+    ) -> "NDArray[np.float64]":
+        """Estimate the quantiles `qs` of values between `low` and `high`."""
+        import numpy as np
+
+        total = float(self.weights.sum())
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return np.interp(
+            np.array(list(qs)) * total,
+            np.concatenate([[0], centers, [total]]),
+            np.concatenate([[low], self.means, [high]]),
+        )
+
+
+def _float_or_nan(value: float) -> float:
+    try:
+        return float(value)
+    except OverflowError:
+        return math.nan
+
+
+@dataclass
+class NumericSummary:
+    """Count, mean, standard deviation and range of numbers, and their distribution.
+
+    The mean and variance of each chunk of numbers are combined with the running ones
+    (Chan et al.), so summaries of different files can be merged. The distribution is
+    either all the numbers, in chunks, or a t-digest if `digest` is set.
+
+    Attributes:
+        digest: Approximate distribution, or None to keep all the numbers.
+        count: Number of numbers.
+        skipped: Number of values that aren't finite numbers, including integers too
+            large for a float.
+        mean: Mean of the numbers.
+        m2: Sum of squared differences from the mean.
+        low: Smallest number.
+        high: Largest number.
+        chunks: All the numbers, if `digest` is None.
+    """
+
+    digest: TDigest | None = None
+    count: int = 0
+    skipped: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    low: float = math.inf
+    high: float = -math.inf
+    chunks: "list[NDArray[np.float64]]" = field(
+        default_factory=list["NDArray[np.float64]"]
+    )
+
+    def update(self, values: Iterable[Any]) -> None:
+        """Add the finite numbers in `values`, and count the rest as skipped."""
+        import numpy as np
+
+        values = list(values)
+        numbers = [v for v in values if type(v) is int or type(v) is float]
+        try:
+            array = np.array(numbers, dtype=np.float64)
+        except OverflowError:
+            # JSON integers can be too large for a float, so they're out of range like
+            # infinite numbers.
+            array = np.array([_float_or_nan(v) for v in numbers], dtype=np.float64)
+        numbers = array[np.isfinite(array)]
+        self.skipped += len(values) - len(numbers)
+        if not len(numbers):
+            return
+
+        mean = float(numbers.mean())
+        m2 = float(np.square(numbers - mean).sum())
+        self._combine(
+            len(numbers), mean, m2, float(numbers.min()), float(numbers.max())
+        )
+        if self.digest is None:
+            self.chunks.append(numbers)
+        else:
+            self.digest.update(numbers)
+
+    def merge(self, other: "NumericSummary") -> None:
+        """Add the numbers summarised by `other`, which must be of the same kind."""
+        self.skipped += other.skipped
+        if not other.count:
+            return
+        self._combine(other.count, other.mean, other.m2, other.low, other.high)
+        if self.digest is None:
+            self.chunks.extend(other.chunks)
+        elif other.digest is not None:
+            self.digest.merge(other.digest)
+
+    def _combine(
+        self, count: int, mean: float, m2: float, low: float, high: float
+    ) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.low = min(self.low, low)
+        self.high = max(self.high, high)
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation of the numbers."""
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+    def quantiles(self, qs: Iterable[float]) -> "NDArray[np.float64]":
+        """Quantiles `qs` of the numbers, estimated from the digest if there's one."""
+        import numpy as np
+
+        if self.digest is not None:
+            return self.digest.quantiles(qs, self.low, self.high)
+        return np.quantile(np.concatenate(self.chunks), list(qs))
+
+    def histogram(
+        self, bins: int, log: bool = False
+    ) -> "tuple[NDArray[np.int64], NDArray[np.float64]]":
+        """Count the numbers in `bins` bins between the smallest and largest.
+
+        If all the numbers are equal, there's a single bin, since the others would be
+        empty and have no width.
+
+        Returns:
+            Counts of each bin and the edges of the bins.
+
+        Raises:
+            ValueError: if `log` and the numbers aren't all positive.
+        """
+        import numpy as np
+
+        if self.low == self.high:
+            bins = 1
+        if log:
+            if self.low <= 0:
+                raise ValueError("Log bins require all numbers to be positive.")
+            edges = np.geomspace(self.low, self.high, bins + 1)
+        else:
+            edges = np.linspace(self.low, self.high, bins + 1)
+
+        if self.digest is not None:
+            counts, _ = np.histogram(
+                self.digest.means, bins=edges, weights=self.digest.weights
+            )
+            return np.rint(counts).astype(np.int64), edges
+
+        counts = sum(
+            (np.histogram(chunk, bins=edges)[0] for chunk in self.chunks),
+            start=np.zeros(bins, dtype=np.int64),
+        )
+        return counts, edges
+
+
 @app.command(help=__doc__)
+@profiling.profiled
 def main(
-    input_path: Annotated[
-        Path,
+    inputs: Annotated[
+        list[str],
         typer.Argument(
-            help='Path to JSON file, or "-" for stdin', allow_dash=True, file_okay=True
+            help="JSON files, directories or glob patterns, or - for stdin. Without"
+            " --key, the last one is the key to analyse.",
+            show_default=False,
         ),
     ],
-    key: Annotated[str, typer.Argument(help="Key to analyse in each object")],
+    *,
+    keys: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--key", "-K", help="Key to analyse in each object. Can be repeated."
+        ),
+    ] = None,
+    approx: Annotated[
+        bool,
+        typer.Option("--approx", "-a", help="Count with fixed memory, approximately."),
+    ] = False,
+    top: Annotated[
+        int | None,
+        typer.Option(
+            "--top",
+            "-k",
+            help="Show only the most frequent values. [default: all, or 20 with"
+            " --approx]",
+        ),
+    ] = None,
+    capacity: Annotated[
+        int,
+        typer.Option(help="Number of values counted with --approx.", min=1),
+    ] = 10_000,
+    precision: Annotated[
+        int,
+        typer.Option(
+            help="Bits of the HyperLogLog register index with --approx.", min=4, max=18
+        ),
+    ] = 14,
+    numeric: Annotated[
+        bool,
+        typer.Option(
+            "--numeric", "-n", help="Summarise numbers with statistics and a histogram."
+        ),
+    ] = False,
+    bins: Annotated[
+        int, typer.Option(help="Number of histogram bins with --numeric.", min=1)
+    ] = 10,
+    log_bins: Annotated[
+        bool,
+        typer.Option(help="Use log-spaced histogram bins with --numeric."),
+    ] = False,
+    jobs: Annotated[
+        int | None,
+        typer.Option(
+            "--jobs",
+            "-j",
+            help="Number of worker processes for several files. [default: 1, or one"
+            " per CPU with --approx or --numeric]",
+            min=1,
+        ),
+    ] = None,
 ) -> None:
-    """Display occurrence statistics for values of a key in JSON data.
+    """Display occurrence statistics for values of keys in JSON data.
 
-    Reads JSON data from a file or stdin, counts occurrences of values for the specified
-    key, and outputs statistics including counts and percentages.
+    Reads JSON data from files or stdin, counts occurrences of values for the specified
+    keys, and outputs statistics including counts and percentages.
     """
+    if not keys:
+        if len(inputs) < 2:
+            raise typer.BadParameter("Missing the key to analyse.")
+        *inputs, key = inputs
+        keys = [key]
+
+    if inputs == ["-"]:
+        paths = [Path("-")]
+    else:
+        try:
+            paths = find_files(inputs, JSON_SUFFIXES)
+        except FileNotFoundError as e:
+            raise typer.BadParameter(str(e)) from e
+
     try:
-        show_frequencies(input_path, key)
-    except (json.JSONDecodeError, KeyError) as e:
+        if numeric:
+            show_numeric_statistics(
+                paths, keys, approx=approx, bins=bins, log_bins=log_bins, jobs=jobs
+            )
+        elif approx:
+            show_approx_frequencies(
+                paths,
+                keys,
+                top=20 if top is None else top,
+                capacity=capacity,
+                precision=precision,
+                jobs=jobs,
+            )
+        else:
+            show_frequencies(paths, keys, top=top, jobs=1 if jobs is None else jobs)
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
         typer.secho(f"Error: {e}", fg=typer.colors.RED)
 
 
-def show_frequencies(path: Path, key: str) -> None:
-    """Show frequency of `key` values in `path` file.
+def _iter_batches(path: Path) -> Iterable[tuple[dict[str, Any], ...]]:
+    """Objects of the JSON array or JSON Lines in `path`, in batches.
+
+    Raises:
+        TypeError: if an item isn't an object.
+    """
+    for batch in itertools.batched(read_json(path), _BATCH_SIZE):
+        if not all(isinstance(item, dict) for item in batch):
+            raise TypeError("Input must be a list of objects")
+        yield batch
+
+
+def _map_paths[T](
+    func: Callable[[Path], T], paths: list[Path], jobs: int | None
+) -> Iterator[T]:
+    """Apply `func` to each of `paths` in a process pool, with results in order.
+
+    With a single path or job, `func` runs in this process.
+    """
+    if len(paths) == 1 or jobs == 1:
+        yield from map(func, paths)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(func, paths)
+
+
+def count_values(path: Path, keys: list[str]) -> dict[str, Counter[Any]]:
+    """Count the values of each of `keys` in `path` file, in one pass.
+
+    Raises:
+        ValueError: If the input is not a valid JSON array or JSON Lines
+        TypeError: If the data is not a list of objects
+    """
+    counts = {key: Counter[Any]() for key in keys}
+    for batch in _iter_batches(path):
+        for key, counter in counts.items():
+            counter.update(item.get(key) for item in batch)
+    return counts
+
+
+def sketch_values(
+    path: Path, keys: list[str], capacity: int, precision: int
+) -> tuple[int, dict[str, tuple[SpaceSaving, HyperLogLog]]]:
+    """Summarise the values of each of `keys` in `path` file with fixed memory.
+
+    Returns:
+        Number of objects, and the summary of the most frequent values and of the
+        distinct values of each key.
+
+    Raises:
+        ValueError: If the input is not a valid JSON array or JSON Lines
+        TypeError: If the data is not a list of objects
+    """
+    sketches = {key: (SpaceSaving(capacity), HyperLogLog(precision)) for key in keys}
+    total = 0
+
+    for batch in _iter_batches(path):
+        total += len(batch)
+        for key, (frequent, distinct) in sketches.items():
+            counts = Counter(item.get(key) for item in batch)
+            frequent.update(counts)
+            distinct.update(counts)
+
+    return total, sketches
+
+
+def summarise_numbers(
+    path: Path, keys: list[str], approx: bool
+) -> dict[str, NumericSummary]:
+    """Summarise the numbers of each of `keys` in `path` file, in one pass.
+
+    Raises:
+        ValueError: If the input is not a valid JSON array or JSON Lines
+        TypeError: If the data is not a list of objects
+    """
+    summaries = {key: NumericSummary(TDigest() if approx else None) for key in keys}
+    for batch in _iter_batches(path):
+        for key, summary in summaries.items():
+            summary.update(item.get(key) for item in batch)
+    return summaries
+
+
+def show_frequencies(
+    paths: list[Path],
+    keys: list[str],
+    *,
+    top: int | None = None,
+    jobs: int | None = 1,
+) -> None:
+    """Show frequency of `keys` values in `paths` files, counted by `jobs` processes.
+
+    If `jobs` is None, there's one process per CPU. The counts of each file are added
+    in the order of `paths`, so the output doesn't depend on the number of jobs.
+
+    Raises:
+        ValueError: If the input is not a valid JSON array or JSON Lines
+        TypeError: If the data is not a list of objects
+    """
+    counts = {key: Counter[Any]() for key in keys}
+    with profiling.phase("count"):
+        for file_counts in _map_paths(partial(count_values, keys=keys), paths, jobs):
+            for key, counter in file_counts.items():
+                counts[key].update(counter)
+
+    for key, counter in counts.items():
+        if len(keys) > 1:
+            typer.secho(f"{key}:", bold=True)
+        typer.echo(display_statistics(counter, top))
+        if len(keys) > 1:
+            typer.echo()
+
+
+def show_approx_frequencies(
+    paths: list[Path],
+    keys: list[str],
+    *,
+    top: int,
+    capacity: int,
+    precision: int,
+    jobs: int | None = None,
+) -> None:
+    """Show approximate frequency of `keys` values in `paths` files, with fixed memory.
+
+    The summaries of each file are merged in the order of `paths`, so the output
+    doesn't depend on the number of jobs.
 
     Raises:
-        JSONDecodeError: If the input is not valid JSON
+        ValueError: If the input is not a valid JSON array or JSON Lines
         TypeError: If the data is not a list of objects
     """
-    data = json.loads(sys.stdin.read() if path == Path("-") else path.read_bytes())
+    sketches = {key: (SpaceSaving(capacity), HyperLogLog(precision)) for key in keys}
+    total = 0
+
+    summarise = partial(
+        sketch_values, keys=keys, capacity=capacity, precision=precision
+    )
+    with profiling.phase("count") as phase:
+        for file_total, file_sketches in _map_paths(summarise, paths, jobs):
+            total += file_total
+            for key, (frequent, distinct) in file_sketches.items():
+                sketches[key][0].merge(frequent)
+                sketches[key][1].merge(distinct)
+        phase.records += total
+
+    for key, (frequent, distinct) in sketches.items():
+        if len(keys) > 1:
+            typer.secho(f"{key}:", bold=True)
+        typer.echo(display_approx_statistics(frequent, distinct, total, top))
+        if len(keys) > 1:
+            typer.echo()
+
 
-    if not (isinstance(data, list) and isinstance(data[0], dict)):
-        raise TypeError("Error: Input must be a list of objects")
+def show_numeric_statistics(
+    paths: list[Path],
+    keys: list[str],
+    *,
+    approx: bool,
+    bins: int,
+    log_bins: bool,
+    jobs: int | None = None,
+) -> None:
+    """Show statistics and a histogram of the numbers of `keys` in `paths` files.
 
-    data = cast(list[dict[str, Any]], data)
-    counts = Counter(item.get(key) for item in data)
+    Raises:
+        ValueError: If the input is not a valid JSON array or JSON Lines, or the log
+            bins have non-positive numbers
+        TypeError: If the data is not a list of objects
+    """
+    summaries = {key: NumericSummary(TDigest() if approx else None) for key in keys}
+    summarise = partial(summarise_numbers, keys=keys, approx=approx)
+    with profiling.phase("count"):
+        for file_summaries in _map_paths(summarise, paths, jobs):
+            for key, summary in file_summaries.items():
+                summaries[key].merge(summary)
 
-    typer.echo(display_statistics(counts))
+    for key, summary in summaries.items():
+        if len(keys) > 1:
+            typer.secho(f"{key}:", bold=True)
+        typer.echo(display_numeric_statistics(summary, bins, log_bins))
+        if len(keys) > 1:
+            typer.echo()
 
 
-def display_statistics(counts: Counter[Any]) -> str:
+def display_statistics(counts: Counter[Any], top: int | None = None) -> str:
     """Build a formatted string of statistics about the counted values."""
     if not counts:
         return "No data to analyse"
 
     total = sum(counts.values())
 
-    counts_str = [(str(value), count) for value, count in counts.most_common()]
+    counts_str = [(str(value), count) for value, count in counts.most_common(top)]
     val_maxlen = max(len(val) for val, _ in counts_str)
     padding = max(val_maxlen, len("Total")) + 1
 
@@ -71,7 +715,77 @@ def display_statistics(counts: Counter[Any]) -> str:
         f"{value:<{padding}}: {count} ({count / total:.2%})"
         for value, count in counts_str
     ]
-    lines.extend(["", f"{"Total":<{padding}}: {total}"])
+    lines.extend(["", f"{'Total':<{padding}}: {total}"])
+
+    return "\n".join(lines)
+
+
+def display_approx_statistics(
+    frequent: SpaceSaving, distinct: HyperLogLog, total: int, top: int
+) -> str:
+    """Build a formatted string of the approximate statistics of the counted values."""
+    if not total:
+        return "No data to analyse"
+
+    counts_str = [
+        (str(value), count, error) for value, count, error in frequent.most_common(top)
+    ]
+    val_maxlen = max((len(val) for val, _, _ in counts_str), default=0)
+    padding = max(val_maxlen, len("Distinct")) + 1
+
+    lines = [
+        f"{value:<{padding}}: {count} ({count / total:.2%})"
+        + (f" error <= {error}" if error else "")
+        for value, count, error in counts_str
+    ]
+    std_error = 1.04 / math.sqrt(len(distinct.registers))
+    lines.extend(
+        [
+            "",
+            f"{'Total':<{padding}}: {total}",
+            f"{'Distinct':<{padding}}: ~{distinct.estimate():.0f} (±{std_error:.1%})",
+        ]
+    )
+
+    return "\n".join(lines)
+
+
+def display_numeric_statistics(
+    summary: NumericSummary, bins: int, log_bins: bool
+) -> str:
+    """Build a formatted string of the statistics and histogram of the numbers."""
+    if not summary.count:
+        return f"No numbers to analyse (skipped {summary.skipped})"
+
+    approx = "~" if summary.digest is not None else ""
+    rows = [
+        ("Count", f"{summary.count}"),
+        ("Skipped", f"{summary.skipped}"),
+        ("Mean", f"{summary.mean:.6g}"),
+        ("Std", f"{summary.std:.6g}"),
+        ("Min", f"{summary.low:.6g}"),
+        *(
+            (f"p{q * 100:g}", f"{approx}{value:.6g}")
+            for q, value in zip(_QUANTILES, summary.quantiles(_QUANTILES), strict=True)
+        ),
+        ("Max", f"{summary.high:.6g}"),
+    ]
+    padding = max(len(name) for name, _ in rows) + 1
+    lines = [f"{name:<{padding}}: {value}" for name, value in rows]
+
+    counts, edges = summary.histogram(bins, log_bins)
+    ranges = [f"[{lo:.4g}, {hi:.4g})" for lo, hi in itertools.pairwise(edges)]
+    ranges[-1] = ranges[-1][:-1] + "]"
+    range_width = max(len(r) for r in ranges)
+    count_width = len(approx) + len(str(counts.max()))
+    scale = _HISTOGRAM_WIDTH / max(int(counts.max()), 1)
+
+    lines.append("")
+    lines.extend(
+        f"{r:<{range_width}} {approx + str(count):>{count_width}}"
+        f" {'#' * round(count * scale)}"
+        for r, count in zip(ranges, counts.tolist(), strict=True)
+    )
 
     return "\n".join(lines)
 
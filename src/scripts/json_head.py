@@ -2,19 +2,55 @@
 
 Example:
 
-    $ jhead file.json     # first 10 items of the file
-    $ jhead file.json 5   # first 5 items of the file
-    $ echo ... | jhead    # first 10 items from stdin
-    $ echo ... | jhead 5  # first 5 items from stdin
+    $ jhead file.json                # first 10 items of the file
+    $ jhead file.json 5              # first 5 items of the file
+    $ echo ... | jhead               # first 10 items from stdin
+    $ echo ... | jhead 5             # first 5 items from stdin
+    $ jhead file.json --tail 20      # last 20 items of the file
+    $ jhead file.json --slice 40:50  # items 40 to 49 of the file
+    $ jhead file.json --at -1 -i     # last item of the file, using the index
+
+The input can be a JSON array or JSON Lines, and compressed with gzip, bzip2 or
+Zstandard. It's parsed incrementally and reading stops after the first items, so the
+time and memory don't depend on the size of the input.
+
+With `--index`, a sidecar index with the byte offset and length of every item is saved
+next to the file. It's built on the first use and rebuilt when the file's size or
+modification time change. With the index, only the selected items are read and parsed.
+The index requires an uncompressed file.
 """
 
+import contextlib
+import itertools
 import json
-import sys
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+from collections.abc import Generator, Iterable
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any
 
 import typer
 
+from scripts import profiling
+from scripts.util import (
+    is_compressed,
+    iter_json,
+    iter_json_offsets,
+    loads,
+    open_json,
+)
+
+# Header of the index: magic, size and modification time (ns) of the indexed file, and
+# number of items. Followed by the (offset, length) pairs of each item as int64.
+_INDEX_HEADER = struct.Struct("=8sqqq")
+_INDEX_MAGIC = b"JHEADIX1"
+
+# Number of (offset, length) pairs buffered before being written to the index.
+_INDEX_WRITE_BATCH = 1 << 16
+
 app = typer.Typer(
     context_settings={"help_option_names": ["-h", "--help"]},
     add_completion=False,
@@ -23,7 +59,133 @@ app = typer.Typer(
 )
 
 
+def index_path(path: Path) -> Path:
+    """Path of the sidecar index for the JSON file `path`."""
+    return path.with_name(f"{path.name}.jhead-index")
+
+
+def _index_is_valid(index: Path, stat: os.stat_result) -> bool:
+    """Check if `index` exists and was built for a file with `stat`."""
+    try:
+        with index.open("rb") as f:
+            header = f.read(_INDEX_HEADER.size)
+    except FileNotFoundError:
+        return False
+
+    if len(header) < _INDEX_HEADER.size:
+        return False
+    magic, size, mtime_ns, _ = _INDEX_HEADER.unpack(header)
+    return magic == _INDEX_MAGIC and (size, mtime_ns) == (
+        stat.st_size,
+        stat.st_mtime_ns,
+    )
+
+
+def build_index(path: Path, index: Path) -> None:
+    """Build the `index` with the offset and length of each item in `path`.
+
+    The index is written to a temporary file, which replaces `index` when complete and
+    is removed if building fails.
+
+    Raises:
+        ValueError: if `path` isn't a valid JSON array or JSON Lines.
+    """
+    stat = path.stat()
+    tmp = index.with_name(f"{index.name}.tmp")
+    count = 0
+
+    try:
+        with path.open("rb") as data, tmp.open("wb") as out:
+            out.write(_INDEX_HEADER.pack(_INDEX_MAGIC, 0, 0, 0))
+
+            spans = (span for _, *span in iter_json_offsets(data))
+            while batch := list(itertools.islice(spans, _INDEX_WRITE_BATCH)):
+                array("q", itertools.chain.from_iterable(batch)).tofile(out)
+                count += len(batch)
+
+            out.seek(0)
+            out.write(
+                _INDEX_HEADER.pack(_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, count)
+            )
+        tmp.replace(index)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def open_index(path: Path) -> Generator[memoryview]:
+    """Memory-map the index for `path`, building it first if it's missing or stale.
+
+    Yields:
+        Flat view of the (offset, length) pairs of each item, as int64.
+    """
+    index = index_path(path)
+    if not _index_is_valid(index, path.stat()):
+        build_index(path, index)
+
+    with (
+        index.open("rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        memoryview(mm) as view,
+        view[_INDEX_HEADER.size :].cast("q") as spans,
+    ):
+        yield spans
+
+
+def select_indexed(path: Path, selection: slice) -> list[Any]:
+    """Read the items in `selection` from `path` by seeking to their offsets."""
+    with open_index(path) as spans, path.open("rb") as data:
+        items: list[Any] = []
+        for i in range(len(spans) // 2)[selection]:
+            data.seek(spans[2 * i])
+            items.append(loads(data.read(spans[2 * i + 1])))
+        return items
+
+
+def select_stream(items: Iterable[Any], selection: slice) -> list[Any]:
+    """Get the items in `selection` from `items`, keeping as few items as possible.
+
+    Negative positions are relative to the end, so the stream must be consumed until the
+    end, keeping only the last items that might be selected.
+    """
+    start, stop = selection.start or 0, selection.stop
+    if start >= 0 and (stop is None or stop >= 0):
+        return list(itertools.islice(items, start, stop))
+
+    if start < 0:
+        window: deque[Any] = deque(maxlen=-start)
+        n = 0
+        for item in items:
+            window.append(item)
+            n += 1
+        selected = range(n)[selection]
+        return [item for i, item in enumerate(window, n - len(window)) if i in selected]
+
+    # Non-negative start and negative stop: everything after `start` except the last
+    # `-stop` items, which are held back until we know they're not at the end.
+    held: deque[Any] = deque()
+    result: list[Any] = []
+    for item in itertools.islice(items, start, None):
+        held.append(item)
+        if len(held) > -stop:
+            result.append(held.popleft())
+    return result
+
+
+def _parse_slice(value: str) -> slice:
+    start, sep, stop = value.partition(":")
+    if not sep:
+        raise typer.BadParameter(f"Expected START:END, got {value!r}")
+    try:
+        return slice(int(start) if start else None, int(stop) if stop else None)
+    except ValueError as e:
+        raise typer.BadParameter(
+            f"Expected integers in START:END, got {value!r}"
+        ) from e
+
+
 @app.command(help=__doc__)
+@profiling.profiled
 def main(
     path: Annotated[
         Path,
@@ -32,10 +194,66 @@ def main(
         ),
     ] = Path("-"),
     count: Annotated[int, typer.Argument(help="Number of items to show")] = 5,
+    tail: Annotated[
+        int | None,
+        typer.Option("--tail", "-t", help="Show the last N items instead."),
+    ] = None,
+    slice_: Annotated[
+        str | None,
+        typer.Option(
+            "--slice",
+            "-s",
+            help="Show the items from START to END (exclusive), like a Python slice.",
+            metavar="START:END",
+        ),
+    ] = None,
+    at: Annotated[
+        int | None,
+        typer.Option("--at", "-a", help="Show only the item at this position."),
+    ] = None,
+    index: Annotated[
+        bool,
+        typer.Option(
+            "--index",
+            "-i",
+            help="Use (and build if needed) a sidecar index to seek to the items.",
+        ),
+    ] = False,
 ) -> None:
     """Display first `count` items in a JSON array from a file or stdin."""
-    data = json.loads(sys.stdin.read() if path == Path("-") else path.read_bytes())
-    print(json.dumps(data[:count], indent=4))
+    if sum(option is not None for option in (tail, slice_, at)) > 1:
+        raise typer.BadParameter("Only one of --tail, --slice and --at can be used.")
+
+    if tail is not None:
+        selection = slice(-tail, None) if tail > 0 else slice(0, 0)
+    elif slice_ is not None:
+        selection = _parse_slice(slice_)
+    elif at is not None:
+        selection = slice(at, at + 1 if at != -1 else None)
+    else:
+        selection = slice(0, count)
+
+    if index:
+        if path == Path("-"):
+            raise typer.BadParameter("--index requires a file, not stdin.")
+        if is_compressed(path):
+            raise typer.BadParameter("--index requires an uncompressed file.")
+        with profiling.phase("select") as phase:
+            items = select_indexed(path, selection)
+            phase.records += len(items)
+    else:
+        # Selecting from the stream includes reading the items before the selection.
+        with profiling.phase("select") as phase, open_json(path) as file:
+            items = select_stream(iter_json(file), selection)
+            phase.records += len(items)
+
+    if at is not None and not items:
+        raise typer.BadParameter(f"No item at position {at}.")
+    with profiling.phase("render") as phase:
+        text = json.dumps(items[0] if at is not None else items, indent=4)
+        print(text)
+        phase.records += len(items)
+        phase.bytes += len(text)
 
 
 if __name__ == "__main__":
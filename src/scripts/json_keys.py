@@ -1,16 +1,11 @@
 #!/usr/bin/env python3
 "Obtain information about the keys of a JSON file containing a list of objects."
 
-import argparse
-import json
-import sys
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, cast
 
-from beartype.door import is_bearable
-
-from scripts.util import HelpOnErrorArgumentParser
+from scripts.util import HelpOnErrorArgumentParser, is_object_list, load_json
 
 
 @dataclass
@@ -90,10 +85,10 @@ def main() -> None:
     parser = HelpOnErrorArgumentParser(__doc__)
     parser.add_argument(
         "files",
-        type=argparse.FileType("r"),
         nargs="*",
-        default=[sys.stdin],
-        help="Paths to the JSON files.",
+        default=["-"],
+        help="Paths to the JSON or JSON Lines files (can be compressed), or - for"
+        " stdin.",
     )
     parser.add_argument(
         "--count",
@@ -112,14 +107,16 @@ def main() -> None:
     args = parser.parse_args()
 
     for file in args.files:
-        data = json.load(file)
+        name = "<stdin>" if file == "-" else file
+        data = load_json(file)
         if args.path:
             data = get_path(data, args.path)
 
-        if not is_bearable(data, list[dict[str, Any]]):
-            print(f"{file.name}: Invalid JSON format. Expected a list of objects.")
-            if is_bearable(data, dict[str, Any]):
-                print("Found object with keys:", ", ".join(repr(k) for k in data))
+        if not is_object_list(data):
+            print(f"{name}: Invalid JSON format. Expected a list of objects.")
+            if isinstance(data, dict):
+                keys = cast(dict[str, Any], data)
+                print("Found object with keys:", ", ".join(repr(k) for k in keys))
                 print("Use --path/-p with one of these keys.")
             continue
 
@@ -129,7 +126,7 @@ def main() -> None:
         headers = ["Name", "Type", "Nullable"]
         if args.count:
             headers.extend(["Count", "%"])
-        print(print_table(file.name, headers, table, len(data)), end="\n\n")
+        print(print_table(name, headers, table, len(data)), end="\n\n")
 
 
 if __name__ == "__main__":
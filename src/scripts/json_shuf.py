@@ -2,19 +2,228 @@
 
 The input JSON file can be provided as an argument or piped in through stdin.
 The output JSON file can be provided as an argument or piped out through stdout.
+The input can also be JSON Lines, and compressed with gzip, bzip2 or Zstandard.
 
 A random seed can be provided to ensure reproducibility.
+
+With `--out-of-core`, the input file isn't loaded into memory. It's scanned once to
+record the byte offset and length of each item (16 bytes per item), the offsets are
+shuffled, and the items are read back from a memory map of the input in the new order.
+The output is the same as the in-memory shuffle with the same seed. The input can also
+be JSON Lines in this mode, but it must be a file, not stdin. Compressed files can't be
+read at an offset, so they're shuffled in memory even with `--out-of-core`.
+
+With `-k`, a sample of `k` items is drawn in a single pass over the input (a file or
+stdin, JSON array or JSON Lines), keeping only `k` items in memory, and then shuffled.
+The sample is deterministic for a given seed. JSON Lines are only parsed if they're in
+the sample, so sampling them is much faster than sampling an array.
+
+With `--split`, e.g. `--split train=0.8,dev=0.1,test=0.1`, each item is assigned to a
+split by a hash of its position and the seed, or of the value of a key with `--by`, in
+a single pass. The splits are written at the same time to files named after the output,
+e.g. `data.train.json` for `data.json`, in their original order. Memory doesn't depend
+on the size of the input, and with `--by`, items keep their split when the dataset
+grows.
 """
 
+import bisect
+import contextlib
+import hashlib
+import io
+import itertools
 import json
+import math
+import mmap
 import random
 import sys
+from array import array
+from collections.abc import Iterable, Iterator
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO, cast
+
+from scripts import profiling
+from scripts.util import (
+    HelpOnErrorArgumentParser,
+    JsonItemWriter,
+    is_compressed,
+    iter_json,
+    iter_json_offsets,
+    load_json,
+    loads,
+    open_json,
+    reservoir_sample,
+    write_json_items,
+)
+
+
+def index_items(path: Path) -> tuple[array[int], array[int]]:
+    """Scan `path` once for the byte offset and length of each item."""
+    offsets, lengths = array("q"), array("q")
+    with path.open("rb") as f:
+        for _, offset, length in iter_json_offsets(f):
+            offsets.append(offset)
+            lengths.append(length)
+    return offsets, lengths
+
+
+def _read_items(
+    data: mmap.mmap, offsets: array[int], lengths: array[int]
+) -> Iterator[Any]:
+    for offset, length in zip(offsets, lengths, strict=True):
+        yield loads(data[offset : offset + length])
+
+
+def shuffle_file(path: Path, output: TextIO, rng: random.Random) -> int:
+    """Write the items of `path` to `output` shuffled, without loading the file.
+
+    `path` must not be compressed, since the items are read back at their offsets.
+
+    The items are in the same order as `rng.shuffle` would put them in a list of all
+    the items, since it only depends on the number of items.
+
+    Returns:
+        Number of items written.
+    """
+    with profiling.phase("shuffle") as phase:
+        offsets, lengths = index_items(path)
+
+        # Shuffle both arrays with the same random state, so they stay aligned.
+        state = rng.getstate()
+        rng.shuffle(offsets)
+        rng.setstate(state)
+        rng.shuffle(lengths)
+        phase.records += len(offsets)
+        phase.bytes += sum(lengths)
+
+    if not offsets:
+        return write_json_items([], output)
+    with (
+        path.open("rb") as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        return write_json_items(_read_items(data, offsets, lengths), output)
+
+
+def _is_json_array(file: io.BufferedReader) -> bool:
+    """Check if `file` starts with a JSON array, without consuming anything else."""
+    while (head := file.peek(1)) and not head.removeprefix(b"\xef\xbb\xbf").lstrip():
+        file.read(len(head))
+    return head.removeprefix(b"\xef\xbb\xbf").lstrip().startswith(b"[")
+
+
+def sample_stream(file: io.BufferedReader, k: int, rng: random.Random) -> list[Any]:
+    """Draw a shuffled sample of `k` items from a JSON array or JSON Lines stream.
+
+    Lines of JSON Lines are sampled as raw bytes, and only the sampled lines are
+    parsed. Array items must be parsed to find where they end.
+    """
+    if _is_json_array(file):
+        sample = reservoir_sample(iter_json(file), k, rng)
+    else:
+        sample = [
+            loads(line) for line in reservoir_sample(filter(bytes.strip, file), k, rng)
+        ]
+    rng.shuffle(sample)
+    return sample
+
+
+# Buffer size of each split file, in bytes.
+_SPLIT_BUFFER_SIZE = 1 << 20
+
+
+def parse_splits(value: str) -> dict[str, float]:
+    """Parse splits like `train=0.8,dev=0.1,test=0.1` into their fractions.
+
+    Raises:
+        ValueError: if a split is malformed or repeated, a fraction isn't positive, or
+            the fractions don't add up to 1.
+    """
+    splits: dict[str, float] = {}
+    for part in value.split(","):
+        name, sep, fraction = part.partition("=")
+        name = name.strip()
+        if not sep or not name:
+            raise ValueError(f"Expected NAME=FRACTION, got {part!r}")
+        if name in splits:
+            raise ValueError(f"Split {name!r} is repeated.")
+        splits[name] = float(fraction)
+        if not splits[name] > 0:
+            raise ValueError(f"Fraction of split {name!r} must be positive.")
+
+    if not math.isclose(sum(splits.values()), 1):
+        raise ValueError(f"Fractions must add up to 1, got {sum(splits.values())}.")
+    return splits
 
-from beartype.door import is_bearable
 
-from scripts.util import HelpOnErrorArgumentParser
+def _hash_unit(data: bytes) -> float:
+    """Stable hash of `data` as a float in [0, 1)."""
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return int.from_bytes(digest) / (1 << 64)
+
+
+def assign_splits(
+    items: Iterable[Any], fractions: Iterable[float], seed: int, by: str | None = None
+) -> Iterator[tuple[int, Any]]:
+    """Assign each item to a split by a stable hash, without shuffling.
+
+    The hash is of the seed and either the item's position or, with `by`, the JSON of
+    the item's value for that key. Items with the same value are in the same split.
+
+    Yields:
+        Tuple of the index of the item's split in `fractions` and the item.
+
+    Raises:
+        ValueError: if an item doesn't have the key `by`.
+    """
+    bounds = list(itertools.accumulate(fractions))
+    last = len(bounds) - 1
+    prefix = f"{seed}:".encode()
+
+    for i, item in enumerate(items):
+        if by is None:
+            key = str(i)
+        else:
+            try:
+                key = json.dumps(item[by], sort_keys=True)
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Item {i} doesn't have the key {by!r}.") from e
+        # Rounding can leave the last bound just under 1.
+        split = bisect.bisect_right(bounds, _hash_unit(prefix + key.encode()))
+        yield min(split, last), item
+
+
+def split_stream(
+    items: Iterable[Any],
+    splits: dict[str, float],
+    output: Path,
+    *,
+    seed: int,
+    by: str | None = None,
+) -> dict[str, int]:
+    """Write `items` to one file per split, named after `output`.
+
+    The split files are JSON Lines if `output` ends with `.jsonl`, otherwise JSON
+    arrays.
+
+    Returns:
+        Number of items in each split.
+    """
+    jsonl = output.suffix == ".jsonl"
+    with contextlib.ExitStack() as stack:
+        writers: list[JsonItemWriter] = []
+        for name in splits:
+            path = output.with_name(f"{output.stem}.{name}{output.suffix}")
+            file = stack.enter_context(path.open("w", buffering=_SPLIT_BUFFER_SIZE))
+            writers.append(stack.enter_context(JsonItemWriter(file, jsonl=jsonl)))
+
+        for split, item in assign_splits(items, splits.values(), seed, by):
+            writers[split].write(item)
+
+    return {name: writer.count for name, writer in zip(splits, writers, strict=True)}
+
+
+def _open_output(path: Path | None) -> contextlib.AbstractContextManager[TextIO]:
+    return contextlib.nullcontext(sys.stdout) if path is None else path.open("w")
 
 
 def main() -> None:
@@ -23,7 +232,7 @@ def main() -> None:
         "input",
         type=Path,
         nargs="?",
-        help="Path to input JSON file. If not provided, reads from stdin.",
+        help="Path to input JSON file. If not provided or -, reads from stdin.",
     )
     parser.add_argument(
         "output",
@@ -40,26 +249,81 @@ def main() -> None:
     parser.add_argument(
         "-k", type=int, help="Size of the sample to draw from the dataset."
     )
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="Shuffle an index of the items instead of loading the file into memory.",
+    )
+    parser.add_argument(
+        "--split",
+        metavar="NAME=FRACTION,...",
+        help="Split the items into files by a stable hash, e.g. train=0.8,test=0.2.",
+    )
+    parser.add_argument(
+        "--by",
+        metavar="KEY",
+        help="With --split, hash the value of this key instead of the position.",
+    )
     args = parser.parse_args()
+    if args.input == Path("-"):
+        args.input = None
 
-    if args.input is None:
-        data = json.load(sys.stdin)
-    else:
-        data = json.loads(args.input.read_text())
+    if args.split is not None:
+        if args.output is None:
+            parser.error("--split requires an output file to name the split files.")
+        try:
+            splits = parse_splits(args.split)
+        except ValueError as e:
+            parser.error(str(e))
+        # Splitting includes reading and writing the items.
+        with profiling.phase("split") as phase, open_json(args.input or "-") as file:
+            counts = split_stream(
+                iter_json(file), splits, args.output, seed=args.seed, by=args.by
+            )
+            phase.records += sum(counts.values())
+        for name, count in counts.items():
+            print(f"{name}: {count:,}", file=sys.stderr)
+        return
+    if args.by is not None:
+        parser.error("--by can only be used with --split.")
 
-    if not is_bearable(data, list[Any]):
-        raise ValueError("Invalid JSON format. Expected a list.")
+    if args.k is not None:
+        rng = random.Random(args.seed)
+        with open_json(args.input or "-") as file, _open_output(args.output) as output:
+            # Sampling includes reading the items.
+            with profiling.phase("sample") as phase:
+                sample = sample_stream(file, args.k, rng)
+                phase.records += len(sample)
+            write_json_items(sample, output)
+        return
 
-    random.seed(args.seed)
-    if args.k:
-        data = random.sample(data, k=args.k)
-    else:
+    if args.out_of_core:
+        if args.input is None:
+            parser.error("--out-of-core requires an input file, not stdin.")
+        if not is_compressed(args.input):
+            with _open_output(args.output) as output:
+                shuffle_file(args.input, output, random.Random(args.seed))
+            return
+
+    data = load_json("-" if args.input is None else args.input)
+
+    if not isinstance(data, list):
+        raise ValueError("Invalid JSON format. Expected a list.")  # noqa: TRY004
+    data = cast(list[Any], data)
+
+    with profiling.phase("shuffle") as phase:
+        random.seed(args.seed)
         random.shuffle(data)
+        phase.records += len(data)
 
-    if args.output is None:
-        json.dump(data, sys.stdout, indent=2)
-    else:
-        args.output.write_text(json.dumps(data, indent=2))
+    with profiling.phase("write") as phase:
+        text = json.dumps(data, indent=2)
+        if args.output is None:
+            sys.stdout.write(text)
+        else:
+            args.output.write_text(text)
+        phase.records += len(data)
+        phase.bytes += len(text)
 
 
 if __name__ == "__main__":
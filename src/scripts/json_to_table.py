@@ -1,15 +1,11 @@
 #!/usr/bin/env python3
 "Convert JSON to Markdown table."
 
-import argparse
-import json
 import os
 import sys
 from typing import Any
 
-from beartype.door import is_bearable
-
-from scripts.util import HelpOnErrorArgumentParser
+from scripts.util import HelpOnErrorArgumentParser, is_object_list, load_json
 
 
 def generate_table(headers: list[str], values: list[list[Any]]) -> str:
@@ -48,12 +44,11 @@ def main() -> None:
     parser = HelpOnErrorArgumentParser(__doc__)
     parser.add_argument(
         "file",
-        type=argparse.FileType(),
         default="-",
         nargs="?",
         help=(
-            "The file containing the JSON data to convert to a table. If not provided,"
-            " read from stdin."
+            "The file containing the JSON data to convert to a table, which can be JSON"
+            " Lines or compressed. If not provided, read from stdin."
         ),
     )
     parser.add_argument(
@@ -68,8 +63,8 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    data = json.load(args.file)
-    if not is_bearable(data, list[dict[str, Any]]):
+    data = load_json(args.file)
+    if not is_object_list(data):
         raise ValueError("Invalid JSON format. Expected a list of objects.")
 
     headers = list(data[0].keys())
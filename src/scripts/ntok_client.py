@@ -0,0 +1,177 @@
+"""Entry point of `,ntok`, with a thin client of its `--serve` daemon.
+
+The daemon is for many small calls (e.g. in shell loops or editor hooks), where
+importing Typer and the rest of `scripts.estimate_tokens` takes much longer than the
+count itself. So `main` handles the simple calls with the standard library only: a
+single file or stdin, optionally with `--encoding`. If the daemon is running, they're
+sent to it and the count is printed, without the cache. Other calls, and every call when
+the daemon isn't running, are handled by the full app.
+
+This module is also the daemon's protocol: a `marshal`led dict with the encoding, the
+absolute paths and whether the content follows it, answered by a `marshal`led dict with
+the results or an error. Both `marshal` and `_socket` are built in, so this module
+imports nothing that takes time to load.
+
+The socket is in a directory that only the user can access: `$XDG_RUNTIME_DIR/ntok`, or
+`ntok-UID` in the temporary directory. The client only sends text to it if both belong
+to the user, so other users can't read it by creating the socket first.
+"""
+
+import _socket
+import marshal
+import os
+import sys
+
+# Only imported by type checkers: `typing` alone takes a few milliseconds to import.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import IO
+
+# GPT-4 and later tokeniser.
+DEFAULT_ENCODING = "cl100k_base"
+
+# Size of each block of stdin sent to the daemon, in bytes.
+_SEND_SIZE = 1 << 20
+
+
+def daemon_socket_path() -> str:
+    """Path of the Unix socket where the `--serve` daemon listens."""
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        directory = os.path.join(runtime_dir, "ntok")
+    else:
+        import tempfile
+
+        directory = os.path.join(tempfile.gettempdir(), f"ntok-{os.getuid()}")
+    return os.path.join(directory, "daemon.sock")
+
+
+def _is_private(path: str) -> bool:
+    """Check that `path` and its directory belong to the user, and only it can use it.
+
+    Other users can't replace the file in such a directory.
+    """
+    uid = os.getuid()
+    try:
+        directory = os.stat(os.path.dirname(path))
+        file = os.stat(path)
+    except OSError:
+        return False
+    return (
+        directory.st_uid == uid and not directory.st_mode & 0o077 and file.st_uid == uid
+    )
+
+
+def connect_daemon() -> _socket.socket | None:
+    """Socket connected to the daemon, or None if it isn't running or isn't private."""
+    socket_path = daemon_socket_path()
+    if not _is_private(socket_path):
+        return None
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def query_daemon(
+    encoding: str,
+    paths: "Iterable[str | os.PathLike[str]]" = (),
+    stdin: "IO[bytes] | None" = None,
+    sock: _socket.socket | None = None,
+) -> list[tuple[int, int] | None] | None:
+    """Count `encoding` tokens in `paths` or `stdin` using the daemon.
+
+    Connects to the daemon, unless `sock` is already connected.
+
+    Returns:
+        Tuple of number of tokens and bytes for each path (None if it's binary or
+        unreadable), or a single one for `stdin`. None if the daemon isn't running or
+        failed to count.
+    """
+    if sock is None and (sock := connect_daemon()) is None:
+        return None
+
+    request = {
+        "encoding": encoding,
+        "paths": [os.path.realpath(path) for path in paths],
+        "stdin": stdin is not None,
+    }
+    blocks: list[bytes] = []
+    try:
+        sock.sendall(marshal.dumps(request))
+        if stdin is not None:
+            while block := stdin.read(_SEND_SIZE):
+                sock.sendall(block)
+        sock.shutdown(_socket.SHUT_WR)
+        while block := sock.recv(_SEND_SIZE):
+            blocks.append(block)
+        # A dict with either "results" or "error".
+        response: dict[str, list[tuple[int, int] | None]] = marshal.loads(
+            b"".join(blocks)
+        )
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    finally:
+        sock.close()
+
+    return response.get("results")
+
+
+def _simple_call(args: list[str]) -> tuple[str, str | None] | None:
+    """Encoding and file (None for stdin) of `args`, if they're a simple call.
+
+    A simple call counts a single regular file or stdin, and only has the options
+    `--encoding`, `--no-cache` and `--daemon`. Returns None for any other call.
+    """
+    encoding = DEFAULT_ENCODING
+    files: list[str] = []
+    rest = iter(args)
+    for arg in rest:
+        if arg in {"-e", "--encoding"}:
+            if (value := next(rest, None)) is None:
+                return None
+            encoding = value
+        elif arg.startswith("--encoding="):
+            encoding = arg.removeprefix("--encoding=")
+        elif arg in {"--no-cache", "--daemon"}:
+            continue
+        elif arg.startswith("-"):
+            return None
+        else:
+            files.append(arg)
+
+    if not args or len(files) > 1:
+        return None
+    if not files:
+        return None if sys.stdin.isatty() else (encoding, None)
+    return (encoding, files[0]) if os.path.isfile(files[0]) else None
+
+
+def main() -> None:
+    """Count a simple call with the daemon, or run the full `,ntok` app."""
+    if (call := _simple_call(sys.argv[1:])) is not None and (
+        sock := connect_daemon()
+    ) is not None:
+        encoding, path = call
+        if path is None:
+            results = query_daemon(encoding, stdin=sys.stdin.buffer, sock=sock)
+            if not results or results[0] is None:
+                # stdin was already sent, so it can't be counted again in-process.
+                sys.exit("Error: the daemon failed to count stdin.")
+        else:
+            results = query_daemon(encoding, [path], sock=sock)
+
+        if results and results[0] is not None:
+            print(results[0][0])
+            return
+
+    from scripts.estimate_tokens import app
+
+    app()
+
+
+if __name__ == "__main__":
+    main()
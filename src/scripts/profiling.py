@@ -0,0 +1,215 @@
+"""Profile a run of a script: wall time per phase, throughput and memory.
+
+Every script has `--profile`, added by `scripts.util.HelpOnErrorArgumentParser` or,
+for the Typer apps, by decorating the command with `profiled`. It starts a `Profiler`,
+which reports on stderr as JSON when the script exits:
+
+- command: the arguments of the script.
+- wall_seconds, cpu_seconds: time since profiling started.
+- phases: wall time of each phase, with the records and bytes it processed and their
+  rates per second. Reading (and parsing) JSON and writing JSON are recorded by
+  `scripts.util`, and scripts add their own phases with `phase` for computing and
+  rendering their output. Phases can contain others, e.g. counting values includes
+  reading them, so their times can overlap.
+- peak_rss_bytes, children_peak_rss_bytes: peak resident memory of the script and of
+  its largest worker process.
+- tracemalloc_peak_bytes: peak memory allocated by Python objects, if Python was
+  started with `PYTHONTRACEMALLOC=1` (or `-X tracemalloc`). Otherwise it's null, since
+  tracing allocations makes the script several times slower.
+- stats_path: where the cProfile stats were saved with `--profile-stats`, if anywhere.
+  Read them with `python -m pstats FILE` or a viewer like snakeviz.
+
+Only the main process is profiled. cProfile makes the script slower, so with
+`--profile-stats` the times are most useful relative to each other.
+"""
+
+import contextlib
+import functools
+import inspect
+import sys
+import time
+from collections.abc import Callable, Generator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import cProfile
+
+PROFILE_HELP = (
+    "Report the time of each phase, throughput and peak memory as JSON on stderr."
+    " Run with PYTHONTRACEMALLOC=1 to also trace Python allocations (slower)."
+)
+PROFILE_STATS_HELP = "Save a cProfile of the run to this file. Implies --profile."
+
+
+class Phase:
+    """Wall time of a phase of the run, and the records and bytes it processed."""
+
+    __slots__ = ("bytes", "records", "seconds")
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.records = 0
+        self.bytes = 0
+
+    def report(self) -> dict[str, Any]:
+        """Totals of the phase, and rates per second of the ones that aren't zero."""
+        report: dict[str, Any] = {"seconds": round(self.seconds, 6)}
+        for name, total in (("records", self.records), ("bytes", self.bytes)):
+            if total:
+                report[name] = total
+                if self.seconds:
+                    report[f"{name}_per_second"] = round(total / self.seconds, 1)
+        return report
+
+
+class Profiler:
+    """Record the phases of a run, its memory and optionally its calls."""
+
+    def __init__(self) -> None:
+        self.phases: dict[str, Phase] = {}
+        self.stats_path: Path | None = None
+        self._cprofile: cProfile.Profile | None = None
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def phase(self, name: str) -> Phase:
+        """Phase `name`, which is created the first time."""
+        if (phase := self.phases.get(name)) is None:
+            phase = self.phases[name] = Phase()
+        return phase
+
+    def save_stats(self, path: Path) -> None:
+        """Profile the calls from now on with cProfile, and save them to `path`."""
+        import cProfile
+
+        self.stats_path = path
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def report(self) -> dict[str, Any]:
+        """Report of the run so far."""
+        import resource
+        import tracemalloc
+
+        # Linux reports the peak RSS in KiB, and macOS in bytes.
+        rss_scale = 1 if sys.platform == "darwin" else 1024
+        return {
+            "command": sys.argv,
+            "wall_seconds": round(time.perf_counter() - self._start, 6),
+            "cpu_seconds": round(time.process_time() - self._cpu_start, 6),
+            "phases": {name: phase.report() for name, phase in self.phases.items()},
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            * rss_scale,
+            "children_peak_rss_bytes": resource.getrusage(
+                resource.RUSAGE_CHILDREN
+            ).ru_maxrss
+            * rss_scale,
+            "tracemalloc_peak_bytes": (
+                tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+            ),
+            "stats_path": None if self.stats_path is None else str(self.stats_path),
+        }
+
+    def stop(self) -> None:
+        """Stop profiling, save the cProfile stats and print the report to stderr."""
+        import json
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        report = self.report()
+        if self._cprofile is not None and self.stats_path is not None:
+            self._cprofile.dump_stats(self.stats_path)
+        print(json.dumps(report, indent=2), file=sys.stderr)
+
+
+# Profiler of this run, or None if it isn't being profiled.
+profiler: Profiler | None = None
+
+
+def start(stats_path: Path | None = None) -> None:
+    """Profile the rest of the run, and report it on stderr at exit.
+
+    If `stats_path` is given, the calls are also profiled with cProfile and saved
+    there. Calling it again while profiling only sets `stats_path`.
+    """
+    global profiler  # noqa: PLW0603
+    if profiler is None:
+        import atexit
+
+        profiler = Profiler()
+        atexit.register(profiler.stop)
+    if stats_path is not None:
+        profiler.save_stats(stats_path)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Generator[Phase]:
+    """Add the wall time of the block to the phase `name`, if profiling.
+
+    Yields the phase, so the block can add the records and bytes it processed. If the
+    run isn't being profiled, it's a new phase that's discarded.
+    """
+    if profiler is None:
+        yield Phase()
+        return
+
+    stats = profiler.phase(name)
+    start_time = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds += time.perf_counter() - start_time
+
+
+def profiled[**P, R](command: Callable[P, R]) -> Callable[P, R]:
+    """Add `--profile` and `--profile-stats` to the Typer command `command`.
+
+    Like the ones `scripts.util.HelpOnErrorArgumentParser` adds, the options are handled
+    before `command` runs, so it doesn't get them. Typer is only imported here, so the
+    argparse scripts don't import it with this module.
+
+    Example:
+        >>> @app.command(help=__doc__)
+        ... @profiling.profiled
+        ... def main(file: Path) -> None: ...
+    """
+    from typing import Annotated
+
+    import typer
+
+    signature = inspect.signature(command, eval_str=True)
+    options = [
+        inspect.Parameter(
+            "profile",
+            inspect.Parameter.KEYWORD_ONLY,
+            default=False,
+            annotation=Annotated[bool, typer.Option("--profile", help=PROFILE_HELP)],
+        ),
+        inspect.Parameter(
+            "profile_stats",
+            inspect.Parameter.KEYWORD_ONLY,
+            default=None,
+            annotation=Annotated[
+                Path | None,
+                typer.Option(
+                    "--profile-stats", metavar="FILE", help=PROFILE_STATS_HELP
+                ),
+            ],
+        ),
+    ]
+
+    @functools.wraps(command)
+    def wrapper(*args: Any, **kwargs: Any) -> R:
+        profile = kwargs.pop("profile", False)
+        stats_path = kwargs.pop("profile_stats", None)
+        if profile or stats_path is not None:
+            start(stats_path)
+        return command(*args, **kwargs)
+
+    # Typer reads the parameters from the signature.
+    wrapper.__signature__ = signature.replace(  # type: ignore
+        parameters=[*signature.parameters.values(), *options]
+    )
+    return wrapper
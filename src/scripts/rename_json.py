@@ -2,42 +2,247 @@
 
 """Rename keys in each object in a JSON file.
 
-Input must be a JSON file with a list of objects. The keys to rename must exist in
-all objects. The output file will also be a list of objects with keys specified.
+Input must be a JSON file with a list of objects, or JSON Lines, optionally compressed
+with gzip, bzip2 or Zstandard. The keys to rename must exist in all objects, unless they
+have a default. The output file will also be a list of objects with keys specified, or
+JSON Lines with `--jsonl` or if its name ends with `.jsonl`.
+
+The input is read and the output is written one object at a time, so memory use
+doesn't depend on the size of the file.
 
 The mini-language for renaming keys is:
 - old:new - rename the key 'old' to 'new'
 - just_key - keep the key the same
+- meta.id:id - get the key 'id' of the object in 'meta', and name it 'id'
+- old:new=default - use `default` if 'old' is missing. It's parsed as JSON if valid
+  (e.g. `0`, `null`, `[]`), otherwise it's a string
+- a\\.b:ab - a backslash makes the next character part of the key, so keys can have
+  `.`, `:`, `=` or `\\` (e.g. the key 'a.b' here, instead of 'b' inside 'a')
 
 Only the specified keys will be in the output.
+
+With `--inputs`, the same renames are applied to many files (including directories and
+glob patterns) in parallel, writing each to `--output-dir` with the same name. In this
+mode, all positional arguments are renames.
 """
 
-import argparse
+import contextlib
 import json
+import operator
+import os
+import sys
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator
 from dataclasses import dataclass
-from typing import TextIO
+from pathlib import Path
+from typing import Any, TextIO
+
+from scripts import profiling
+from scripts.util import (
+    JSON_SUFFIXES,
+    HelpOnErrorArgumentParser,
+    find_files,
+    read_json,
+    write_json_items,
+)
+
+type Projection = Callable[[dict[str, Any]], dict[str, Any]]
 
-from scripts.util import HelpOnErrorArgumentParser
+# Suffixes of compressed input files.
+_COMPRESSION_SUFFIXES = (".gz", ".bz2", ".zst")
 
 
 @dataclass(frozen=True)
 class Args:
-    input_file: TextIO
-    output_file: TextIO
+    input_file: str | None
+    output_file: str | None
     rename: list[str]
+    jsonl: bool
+    inputs: list[str] | None
+    output_dir: Path | None
+    jobs: int | None
+
+
+@dataclass(frozen=True)
+class Field:
+    """Key of the output objects and where to get its value from the input.
+
+    Attributes:
+        path: Keys to follow from the input object to the value.
+        name: Key in the output object.
+        required: If the path must be in every object. Otherwise, `default` is used
+            when it's missing.
+        default: Value used if the path is missing and it isn't required.
+    """
+
+    path: tuple[str, ...]
+    name: str
+    required: bool = True
+    default: Any = None
+
+
+def parse_field(spec: str) -> Field:
+    """Parse a rename in the mini-language, e.g. `meta.id:id=0`.
+
+    A backslash escapes the next character in the path and name. The default is the
+    text after the first unescaped `=`, as is.
+    """
+    path: list[str] = []
+    name: str | None = None
+    key: list[str] = []
+    default_text: str | None = None
+
+    i = 0
+    while i < len(spec):
+        char = spec[i]
+        if char == "\\" and i + 1 < len(spec):
+            i += 1
+            key.append(spec[i])
+        elif char == "=":
+            default_text = spec[i + 1 :]
+            break
+        elif char in ":." and name is None:
+            path.append("".join(key))
+            key = []
+            if char == ":":
+                name = ""
+        else:
+            key.append(char)
+        i += 1
+
+    if name is None:
+        path.append("".join(key))
+        name = ".".join(path)
+    else:
+        name = "".join(key) or ".".join(path)
+
+    if default_text is None:
+        return Field(tuple(path), name)
+    try:
+        default = json.loads(default_text)
+    except json.JSONDecodeError:
+        default = default_text
+    return Field(tuple(path), name, required=False, default=default)
+
+
+def _field_getter(field: Field) -> Callable[[Any], Any]:
+    """Function that gets the value of `field` from an input object.
+
+    If the field is required, the function raises KeyError or TypeError when its path
+    is missing. Otherwise, it returns the default.
+    """
+    path, default = field.path, field.default
+    if field.required and len(path) == 1:
+        return operator.itemgetter(path[0])
+
+    def get_required(value: Any) -> Any:
+        for key in path:
+            value = value[key]
+        return value
+
+    def get(value: Any) -> Any:
+        try:
+            return get_required(value)
+        except (KeyError, TypeError, IndexError):
+            return default
+
+    return get_required if field.required else get
+
+
+def compile_projection(fields: Iterable[Field]) -> Projection:
+    """Combine `fields` into a single function that builds the output object.
+
+    The getter of each field is built once, so each object only costs a call per field.
+    """
+    getters = [(field.name, _field_getter(field)) for field in fields]
+    return lambda d: {name: get(d) for name, get in getters}
+
+
+def project(
+    data: Iterable[dict[str, Any]], projection: Projection
+) -> Iterator[dict[str, Any]]:
+    """Apply `projection` to each object, with a clear error for missing keys.
+
+    Raises:
+        ValueError: if a key without a default is missing from an object.
+    """
+    if profiling.profiler is not None:
+        projection = _profile_projection(projection)
+    for i, d in enumerate(data):
+        try:
+            yield projection(d)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Object {i} is missing key {e}") from e
+
+
+def _profile_projection(projection: Projection) -> Projection:
+    """Wrap `projection` to add the time of each call to the project phase."""
+    assert profiling.profiler is not None
+    phase = profiling.profiler.phase("project")
+
+    def timed(d: dict[str, Any]) -> dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            return projection(d)
+        finally:
+            phase.seconds += time.perf_counter() - start
+            phase.records += 1
+
+    return timed
+
+
+def rename_file(
+    input_path: Path, output_path: Path, fields: list[Field], jsonl: bool
+) -> int:
+    """Write the objects of `input_path` with `fields` to `output_path`.
+
+    The output is written to a temporary file that replaces `output_path` when it's
+    complete, so a failure doesn't leave a truncated file.
+
+    Returns:
+        Number of objects written.
+
+    Raises:
+        ValueError: if a key without a default is missing from an object.
+    """
+    projection = compile_projection(fields)
+    with _replace_when_done(output_path) as output_file:
+        return write_json_items(
+            project(read_json(input_path), projection), output_file, jsonl=jsonl
+        )
+
+
+@contextlib.contextmanager
+def _replace_when_done(path: Path) -> Generator[TextIO]:
+    """Open a temporary file to write, which replaces `path` if the block succeeds.
+
+    The temporary file is in the same directory, so replacing is atomic. It's removed
+    if the block fails.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("w") as file:
+            yield file
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _rename_task(task: tuple[Path, Path, list[Field], bool]) -> int:
+    return rename_file(*task)
 
 
 def main() -> None:
     parser = HelpOnErrorArgumentParser(__doc__)
     parser.add_argument(
         "input_file",
-        type=argparse.FileType("r"),
-        help="The input JSON file to rename keys in",
+        nargs="?",
+        help="The input JSON file to rename keys in, or - for stdin",
     )
     parser.add_argument(
         "output_file",
-        type=argparse.FileType("w"),
-        help="The output JSON file to write the renamed keys to",
+        nargs="?",
+        help="The output JSON file to write the renamed keys to, or - for stdout",
     )
     parser.add_argument(
         "rename",
@@ -45,20 +250,84 @@ def main() -> None:
         nargs="+",
         help="A list of key:value pairs to rename, separated by a colon",
     )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Write JSON Lines instead of a JSON array (default if output is .jsonl)",
+    )
+    parser.add_argument(
+        "--inputs",
+        "-i",
+        nargs="+",
+        help="Input files, directories or glob patterns to rename in parallel",
+    )
+    parser.add_argument(
+        "--output-dir",
+        "-O",
+        type=Path,
+        help="Directory where the files from --inputs are written",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        help="Number of worker processes for --inputs, or one per CPU if not set",
+    )
     args = Args(**vars(parser.parse_args()))
 
-    renames: dict[str, str] = {}
-    for r in args.rename:
-        if ":" not in r:
-            renames[r] = r
-        else:
-            old, new = r.split(":")
-            renames[old] = new
+    if args.inputs is None:
+        if args.input_file is None or args.output_file is None:
+            parser.error("input_file and output_file are required without --inputs.")
+        fields = [parse_field(spec) for spec in args.rename]
+        jsonl = args.jsonl or args.output_file.endswith(".jsonl")
+
+        if args.output_file != "-":
+            rename_file(Path(args.input_file), Path(args.output_file), fields, jsonl)
+            return
+        write_json_items(
+            project(read_json(args.input_file), compile_projection(fields)),
+            sys.stdout,
+            jsonl=jsonl,
+        )
+        return
+
+    if args.output_dir is None:
+        parser.error("--output-dir is required with --inputs.")
+    # All positional arguments are renames in this mode.
+    specs = [s for s in (args.input_file, args.output_file) if s] + args.rename
+    fields = [parse_field(spec) for spec in specs]
+
+    try:
+        paths = find_files(args.inputs, JSON_SUFFIXES)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if len({path.name for path in paths}) != len(paths):
+        parser.error("Input files must have different names.")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    tasks: list[tuple[Path, Path, list[Field], bool]] = []
+    for path in paths:
+        # The output isn't compressed, so it doesn't keep the compression suffix.
+        output = args.output_dir / path.name.removesuffix(
+            path.suffix if path.suffix in _COMPRESSION_SUFFIXES else ""
+        )
+        jsonl = args.jsonl or output.suffix == ".jsonl"
+        tasks.append(
+            (path, output.with_suffix(".jsonl") if jsonl else output, fields, jsonl)
+        )
+
+    from concurrent.futures import ProcessPoolExecutor
 
-    data = json.load(args.input_file)
-    new_data = [{new: d[old] for old, new in renames.items()} for d in data]
+    # Only the main process is profiled, so the workers' phases are added up here.
+    with (
+        profiling.phase("rename") as phase,
+        ProcessPoolExecutor(max_workers=args.jobs) as pool,
+    ):
+        total = sum(pool.map(_rename_task, tasks))
+        phase.records += total
+        phase.bytes += sum(path.stat().st_size for path in paths)
 
-    json.dump(new_data, args.output_file, indent=2)
+    print(f"Wrote {total:,} objects to {len(tasks):,} files.", file=sys.stderr)
 
 
 if __name__ == "__main__":
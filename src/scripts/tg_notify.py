@@ -16,12 +16,13 @@ import argparse
 import json
 import sys
 from pathlib import Path
-from typing import BinaryIO, NoReturn
-
-import requests
+from typing import TYPE_CHECKING, BinaryIO, NoReturn
 
 from scripts.util import HelpOnErrorArgumentParser
 
+if TYPE_CHECKING:
+    import requests
+
 level_emojis = {
     "info": "ℹ️",  # noqa: RUF001
     "warning": "⚠️",
@@ -29,7 +30,7 @@ level_emojis = {
 }
 
 
-def log_error(source: str, response: requests.Response) -> NoReturn:
+def log_error(source: str, response: "requests.Response") -> NoReturn:
     """Log an error message with the code and description, then terminates."""
     try:
         desc = response.json()["description"]
@@ -56,6 +57,8 @@ def send_message(
     header = f"{emoji} {title or level.upper()} {emoji}"
     message = f"{header}\n\n{message}"
 
+    import requests
+
     url = f"https://api.telegram.org/bot{token}/sendMessage"
     data = {"chat_id": chat_id, "text": message}
 
@@ -82,6 +85,8 @@ def send_document(
     emoji = level_emojis[level]
     caption = f"{emoji} {caption or level.upper()} {emoji}"
 
+    import requests
+
     url = f"https://api.telegram.org/bot{token}/sendDocument"
     params = {"chat_id": chat_id, "caption": caption}
     files = {"document": document_file}
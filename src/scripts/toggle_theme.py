@@ -19,8 +19,6 @@ import sys
 from enum import Enum
 from pathlib import Path
 
-import yaml
-
 from scripts.util import HelpOnErrorArgumentParser
 
 config_files = {
@@ -69,6 +67,8 @@ def fish_theme(theme: str) -> None:
 
 def lazygit_theme(theme: str) -> None:
     """Read theme from a file and updates the config file's `gui` key."""
+    import yaml
+
     config_dir = Path("~/.config/lazygit").expanduser()
 
     config_path = config_dir / "config.yml"
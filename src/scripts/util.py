@@ -1,7 +1,61 @@
 import argparse
+import codecs
+import contextlib
+import functools
+import glob
+import io
+import itertools
+import json
+import math
+import mmap
+import os
+import random
+import re
+import stat
 import sys
-from collections.abc import Sequence
-from typing import Any, NoReturn, override
+import time
+from collections.abc import Collection, Generator, Iterable, Iterator, Sequence
+from pathlib import Path
+from types import ModuleType
+from typing import IO, Any, NoReturn, Self, TextIO, TypeGuard, cast, override
+
+from scripts import profiling
+
+# Size of each chunk read when streaming JSON, in bytes.
+_JSON_READ_SIZE = 1 << 20
+
+# Number of items encoded at once when writing a JSON array.
+_JSON_WRITE_BATCH = 256
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_ENCODER = json.JSONEncoder()
+# Whitespace and commas between array items.
+_ARRAY_SEPARATOR = re.compile(r"[\s,]*")
+_WHITESPACE = re.compile(r"\s*")
+# Characters that can continue a number, which might have been cut at the end of the
+# buffer (e.g. `1.` from `1.5`).
+_NUMBER_CHARS = "0123456789.eE+-"
+
+# Suffixes of JSON and JSON Lines files, including compressed ones, which are read by
+# `open_json`.
+JSON_SUFFIXES = tuple(
+    base + compression
+    for base in (".json", ".jsonl")
+    for compression in ("", ".gz", ".bz2", ".zst")
+)
+
+# Byte order mark that some editors write at the start of UTF-8 files.
+_UTF8_BOM = b"\xef\xbb\xbf"
+
+# Magic bytes at the start of compressed files.
+_GZIP_MAGIC = b"\x1f\x8b"
+_BZIP2_MAGIC = b"BZh"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_COMPRESSED_MAGICS = (_GZIP_MAGIC, _BZIP2_MAGIC, _ZSTD_MAGIC)
+
+# Inputs smaller than this, in bytes, are parsed with the standard library, since
+# importing orjson takes longer than parsing them.
+_ORJSON_MIN_SIZE = 1 << 16
 
 
 class ArgumentDefaultsRawDescriptionFormatter(
@@ -19,8 +73,27 @@ class ArgumentDefaultsRawDescriptionFormatter(
     pass
 
 
+class _ProfileAction(argparse.Action):
+    """Start profiling when `--profile` or `--profile-stats FILE` is parsed."""
+
+    @override
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: Any,
+        option_string: str | None = None,
+    ) -> None:
+        profiling.start(values if isinstance(values, Path) else None)
+
+
 class HelpOnErrorArgumentParser(argparse.ArgumentParser):
-    """ArgumentParser that prints the full help text on error."""
+    """ArgumentParser that prints the full help text on error.
+
+    It also adds `--profile` and `--profile-stats`, which profile the run (see
+    `scripts.profiling`). They're handled while parsing, so they're not in the parsed
+    arguments.
+    """
 
     @override
     def error(self, message: str) -> NoReturn:
@@ -78,3 +151,542 @@ class HelpOnErrorArgumentParser(argparse.ArgumentParser):
             allow_abbrev=allow_abbrev,
             exit_on_error=exit_on_error,
         )
+        self.add_argument(
+            "--profile",
+            nargs=0,
+            action=_ProfileAction,
+            default=argparse.SUPPRESS,
+            help=profiling.PROFILE_HELP,
+        )
+        self.add_argument(
+            "--profile-stats",
+            type=Path,
+            metavar="FILE",
+            action=_ProfileAction,
+            default=argparse.SUPPRESS,
+            help=profiling.PROFILE_STATS_HELP,
+        )
+
+
+def find_files(inputs: Iterable[str], suffixes: Collection[str]) -> list[Path]:
+    """Expand directories (recursively) and glob patterns in `inputs` into files.
+
+    Files given explicitly are always kept. Files found in directories or by globs are
+    only kept if their name ends with one of `suffixes`, e.g. `.json` or `.json.gz`. The
+    files found for each input are sorted and duplicates are removed.
+
+    Raises:
+        FileNotFoundError: if an input doesn't exist and doesn't match any files.
+    """
+    files: list[Path] = []
+
+    for input_ in inputs:
+        path = Path(input_)
+        if path.is_file():
+            files.append(path)
+            continue
+
+        if path.is_dir():
+            found = path.rglob("*")
+        elif matches := glob.glob(input_, recursive=True):
+            found = (
+                file
+                for match in map(Path, matches)
+                for file in (match.rglob("*") if match.is_dir() else [match])
+            )
+        else:
+            raise FileNotFoundError(f"No such file, directory or pattern: {input_}")
+
+        files.extend(
+            sorted(p for p in found if p.name.endswith(tuple(suffixes)) and p.is_file())
+        )
+
+    return list(dict.fromkeys(files))
+
+
+def reservoir_sample[T](items: Iterable[T], k: int, rng: random.Random) -> list[T]:
+    """Sample `k` items uniformly from `items` in a single pass, using Algorithm L.
+
+    Only `k` items are kept in memory, and the random number generator is only called
+    when an item enters the sample, so the items in between are skipped cheaply. The
+    sample is in no particular order, and it's all of `items` if there are at most `k`.
+    """
+    it = iter(items)
+    sample = list(itertools.islice(it, k))
+    if len(sample) < k or k == 0:
+        return sample
+
+    w = math.exp(math.log(_random_open(rng)) / k)
+    while True:
+        # Number of items to skip before the next one that enters the sample. `w` can
+        # round to 1 when `k` is large, and then no items are skipped.
+        skip = math.floor(math.log(_random_open(rng)) / math.log1p(-w)) if w < 1 else 0
+        try:
+            item = next(itertools.islice(it, skip, None))
+        except StopIteration:
+            return sample
+        sample[rng.randrange(k)] = item
+        w *= math.exp(math.log(_random_open(rng)) / k)
+
+
+def _random_open(rng: random.Random) -> float:
+    """Random float in the open interval (0, 1), so that its log is finite."""
+    while (x := rng.random()) == 0:
+        pass
+    return x
+
+
+class JsonItemWriter:
+    """Write items one at a time as a JSON array or JSON Lines.
+
+    The array is formatted the same as `json.dump(items, file, indent=indent)`. Its
+    items are encoded in small batches, which is much faster than encoding them one by
+    one when indenting, and only one batch is in memory at a time. Several writers can
+    be used at the same time, e.g. to write items to different files while streaming.
+
+    The output is only complete after `close`, which is called when the writer is used
+    as a context manager and no exception is raised.
+    """
+
+    def __init__(
+        self, file: TextIO, jsonl: bool = False, indent: int | None = 2
+    ) -> None:
+        self.file = file
+        self.jsonl = jsonl
+        self.count = 0
+        self._batch: list[Any] = []
+        self._encode = (
+            _JSON_ENCODER.encode if jsonl else json.JSONEncoder(indent=indent).encode
+        )
+        # Between the items of two batches. With indentation, each item already starts
+        # with its newline.
+        self._separator = ", " if indent is None else ","
+        self._trailer = "]" if indent is None else "\n]"
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: object) -> None:
+        if exc_type is None:
+            self.close()
+
+    def write(self, item: Any) -> None:
+        """Add `item` to the output."""
+        self._batch.append(item)
+        if len(self._batch) >= _JSON_WRITE_BATCH:
+            self._flush()
+
+    def close(self) -> None:
+        """Write the rest of the items and the end of the array."""
+        self._flush()
+        if not self.jsonl:
+            self.file.write(self._trailer if self.count else "[]")
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+        with profiling.phase("write") as phase:
+            if self.jsonl:
+                text = "".join(f"{self._encode(item)}\n" for item in self._batch)
+            else:
+                # Encode the batch as an array and write it without the brackets.
+                text = self._encode(self._batch)[1 : -len(self._trailer)]
+                self.file.write(self._separator if self.count else "[")
+            self.file.write(text)
+            phase.records += len(self._batch)
+            phase.bytes += len(text)
+        self.count += len(self._batch)
+        self._batch = []
+
+
+def write_json_items(
+    items: Iterable[Any], file: TextIO, jsonl: bool = False, indent: int | None = 2
+) -> int:
+    """Write `items` as a JSON array or JSON Lines, without keeping them in memory.
+
+    See `JsonItemWriter` for the format.
+
+    Returns:
+        Number of items written.
+    """
+    with JsonItemWriter(file, jsonl, indent) as writer:
+        for item in items:
+            writer.write(item)
+    return writer.count
+
+
+def iter_json_offsets(
+    file: IO[bytes], chunk_size: int = _JSON_READ_SIZE, head: bytes = b""
+) -> Iterator[tuple[Any, int, int]]:
+    """Iterate over the items of a JSON array or the values of a JSON Lines file.
+
+    If the first non-whitespace character is `[`, the input is a JSON array and each of
+    its items is yielded. Otherwise, it's JSON Lines and each non-empty line is parsed
+    and yielded. JSON Lines where the first value is an array are told apart by their
+    first line, which is a whole value followed by more lines. If that line is longer
+    than `chunk_size`, the input is read as an array and fails at the second line.
+
+    The input is read in chunks of `chunk_size` bytes, so memory is bounded by the
+    largest item, not the input size. If the start of the input was already read from
+    `file` (e.g. to check its format), it's given as `head`.
+
+    Yields:
+        Tuple of the parsed item, its byte offset in the input and its length in bytes.
+        The offsets count the byte order mark, if there's one.
+
+    Raises:
+        ValueError: if the input isn't a valid JSON array or JSON Lines.
+    """
+    head += file.read(chunk_size)
+    bom = len(_UTF8_BOM) if head.startswith(_UTF8_BOM) else 0
+    while not head[bom:].strip() and (chunk := file.read(chunk_size)):
+        head += chunk
+
+    start = len(head) - len(head[bom:].lstrip())
+    if head.startswith(b"[", start) and not _starts_json_lines(head, start):
+        items = _iter_json_array(file, head, start + 1, chunk_size)
+    else:
+        items = _iter_json_lines(file, head[bom:], chunk_size, bom)
+
+    if profiling.profiler is None:
+        yield from items
+    else:
+        yield from _profile_reads(items, file)
+
+
+def _profile_reads[T](items: Iterator[T], file: IO[bytes]) -> Iterator[T]:
+    """Yield `items`, adding the time taken to read and parse them to the read phase."""
+    assert profiling.profiler is not None
+    phase = profiling.profiler.phase("read")
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                phase.seconds += time.perf_counter() - start
+            phase.records += 1
+            yield item
+    finally:
+        # Position in the decompressed input, unless it's a pipe.
+        with contextlib.suppress(OSError):
+            phase.bytes += file.tell()
+
+
+def iter_json(
+    file: IO[bytes], chunk_size: int = _JSON_READ_SIZE, head: bytes = b""
+) -> Iterator[Any]:
+    """Iterate over the items of a JSON array or the values of a JSON Lines file.
+
+    See `iter_json_offsets` for how the input is read.
+
+    Raises:
+        ValueError: if the input isn't a valid JSON array or JSON Lines.
+    """
+    for item, _, _ in iter_json_offsets(file, chunk_size, head):
+        yield item
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    """Parse a JSON document, with orjson if it's installed.
+
+    orjson is much faster, but doesn't support everything the standard library does
+    (e.g. `NaN` or integers over 64 bits), so documents it rejects are parsed again
+    with the standard library.
+
+    Raises:
+        ValueError: if `data` isn't valid JSON.
+    """
+    if (orjson := _orjson()) is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _loads_input(data: bytes | memoryview) -> Any:
+    """Like `loads`, but without importing orjson for small inputs."""
+    if len(data) < _ORJSON_MIN_SIZE:
+        return json.loads(data.tobytes() if isinstance(data, memoryview) else data)
+    return loads(data)
+
+
+@functools.cache
+def _orjson() -> ModuleType | None:
+    """Import orjson if it's installed. Only imported when first needed."""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+@contextlib.contextmanager
+def open_json(path: str | Path) -> Generator[io.BufferedReader]:
+    """Open a JSON or JSON Lines file, or stdin if `path` is `-`, for reading bytes.
+
+    Files compressed with gzip, bzip2 or Zstandard are decompressed transparently. The
+    compression is detected from the first bytes, not the file name, so it works for
+    stdin too. Zstandard requires the `zstandard` package.
+
+    Raises:
+        ImportError: if the file is compressed with Zstandard and `zstandard` isn't
+            installed.
+    """
+    with (
+        contextlib.nullcontext(cast(io.BufferedReader, sys.stdin.buffer))
+        if str(path) == "-"
+        else Path(path).open("rb")
+    ) as file:
+        head = file.peek(4)[:4]
+        if head.startswith(_GZIP_MAGIC):
+            import gzip
+
+            stream: io.BufferedIOBase = gzip.GzipFile(fileobj=file)
+        elif head.startswith(_BZIP2_MAGIC):
+            import bz2
+
+            stream = bz2.BZ2File(file)
+        elif head.startswith(_ZSTD_MAGIC):
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError(
+                    f"Reading Zstandard-compressed {path} requires `zstandard`."
+                ) from e
+            reader = zstandard.ZstdDecompressor().stream_reader(file)
+            stream = cast(io.BufferedIOBase, reader)
+        else:
+            yield file
+            return
+
+        with stream, io.BufferedReader(cast(Any, stream)) as reader:
+            yield reader
+
+
+def is_compressed(path: str | Path) -> bool:
+    """Check if the file at `path` is compressed in a format `open_json` reads.
+
+    Like `open_json`, the compression is detected from the first bytes.
+    """
+    with Path(path).open("rb") as file:
+        return file.read(4).startswith(_COMPRESSED_MAGICS)
+
+
+def load_json(path: str | Path) -> Any:
+    """Load a whole JSON document or JSON Lines file, or stdin if `path` is `-`.
+
+    JSON Lines are loaded as a list of their values. Compressed files are read like in
+    `open_json`. Uncompressed files are memory-mapped, so orjson parses them without
+    copying them first.
+
+    Raises:
+        ValueError: if the input isn't a valid JSON document or JSON Lines.
+    """
+    with profiling.phase("read") as phase, open_json(path) as file:
+        if _can_mmap(path, file):
+            with (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+                memoryview(data) as view,
+            ):
+                value = _load_json_bytes(view)
+                phase.bytes += len(view)
+        else:
+            data = file.read()
+            value = _load_json_bytes(data)
+            phase.bytes += len(data)
+        phase.records += _count_items(value)
+        return value
+
+
+def _count_items(value: Any) -> int:
+    """Number of items of `value` if it's a list, otherwise 1."""
+    return len(cast(list[Any], value)) if isinstance(value, list) else 1
+
+
+def _can_mmap(path: str | Path, file: io.BufferedReader) -> bool:
+    """Check if `file` is an uncompressed regular file worth memory-mapping for orjson."""
+    if str(path) == "-" or not isinstance(file.raw, io.FileIO):
+        return False
+    st = os.fstat(file.fileno())
+    return (
+        stat.S_ISREG(st.st_mode)
+        and st.st_size >= _ORJSON_MIN_SIZE
+        and _orjson() is not None
+    )
+
+
+def read_json(path: str | Path) -> Iterator[Any]:
+    """Iterate over the items of a JSON array or JSON Lines file, or stdin if `-`.
+
+    See `open_json` for compression and `iter_json_offsets` for the format.
+
+    Raises:
+        ValueError: if the input isn't a valid JSON array or JSON Lines.
+    """
+    with open_json(path) as file:
+        yield from iter_json(file)
+
+
+def is_object_list(data: Any) -> TypeGuard[list[dict[str, Any]]]:
+    """Check if `data` is a list of JSON objects, as loaded by `load_json`."""
+    return isinstance(data, list) and all(
+        isinstance(item, dict) for item in cast(list[Any], data)
+    )
+
+
+def _load_json_bytes(data: bytes | memoryview) -> Any:
+    """Parse `data` as a JSON document, or as JSON Lines if it has several values."""
+    try:
+        return _loads_input(data)
+    except ValueError as e:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        lines = [line for line in data.splitlines() if line.strip()]
+        # Parsing the lines as a single array is much faster than one by one.
+        with contextlib.suppress(ValueError):
+            items = _loads_input(b"[" + b",".join(lines) + b"]")
+            if len(items) == len(lines):
+                return items
+        try:
+            return [_loads_input(line) for line in lines]
+        except ValueError:
+            raise e from None
+
+
+def _starts_json_lines(head: bytes, start: int) -> bool:
+    """Check if the first line of `head[start:]` is a whole value followed by others.
+
+    A JSON array spans the whole input, so its first line is a value by itself only if
+    nothing but whitespace follows it.
+    """
+    end = head.find(b"\n", start)
+    if end == -1 or not head[end:].strip():
+        return False
+    try:
+        json.loads(head[start:end])
+    except ValueError:
+        return False
+    return True
+
+
+def _iter_json_lines(
+    file: IO[bytes], head: bytes, chunk_size: int, offset: int = 0
+) -> Iterator[tuple[Any, int, int]]:
+    """Parse JSON Lines from `head` followed by the rest of `file`.
+
+    `offset` is the byte offset of `head` in the input. The lines in each chunk are
+    parsed together as a single array, which is much faster than parsing them one by
+    one. If that fails, they're parsed individually to find the invalid line.
+    """
+    rest = b""
+    chunk = head
+
+    while True:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop() if chunk else b""
+
+        values: list[bytes] = []
+        spans: list[tuple[int, int]] = []
+        for line in lines:
+            if line.strip():
+                values.append(line)
+                spans.append((offset, len(line)))
+            offset += len(line) + 1
+
+        items: list[Any]
+        try:
+            items = _loads_input(b"[" + b",".join(values) + b"]")
+        except json.JSONDecodeError:
+            items = []
+        if len(items) != len(values):
+            items = [json.loads(value) for value in values]
+
+        for item, (item_offset, length) in zip(items, spans):
+            yield item, item_offset, length
+
+        if not chunk:
+            return
+        # Read at least as much as is buffered, so reading long lines stays linear.
+        chunk = file.read(max(chunk_size, len(rest)))
+
+
+def _iter_json_array(
+    file: IO[bytes], head: bytes, start: int, chunk_size: int
+) -> Iterator[tuple[Any, int, int]]:
+    """Parse JSON array items from `head[start:]` followed by the rest of `file`.
+
+    Each item is parsed with `JSONDecoder.raw_decode` on a text buffer. An item that
+    fails to parse or isn't followed by a delimiter near the end of the buffer might be
+    cut, so the buffer is extended and the item is parsed again. After the closing `]`,
+    the rest of the input must be whitespace.
+
+    To report byte offsets, `mark` tracks the byte offset of a position in the buffer,
+    and is moved forward by encoding only the text between the two positions.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = decoder.decode(head[start:])
+    pos = 0
+    mark_pos, mark_offset = 0, start
+    eof = False
+
+    def byte_offset(index: int) -> int:
+        nonlocal mark_pos, mark_offset
+        if buf.isascii():
+            mark_offset += index - mark_pos
+        else:
+            mark_offset += len(buf[mark_pos:index].encode())
+        mark_pos = index
+        return mark_offset
+
+    while True:
+        pos = _ARRAY_SEPARATOR.match(buf, pos).end()  # type: ignore[union-attr]
+        if pos < len(buf):
+            if buf[pos] == "]":
+                rest = buf[pos + 1 :]
+                while not rest.strip() and not eof:
+                    chunk = file.read(chunk_size)
+                    eof = not chunk
+                    rest = decoder.decode(chunk, final=eof)
+                if rest.strip():
+                    raise ValueError(
+                        f"Unexpected data after the JSON array: {rest.strip()[:20]!r}"
+                    )
+                return
+
+            try:
+                item, end = _JSON_DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof or not (
+                    e.msg.startswith("Unterminated string") or e.pos >= len(buf) - 8
+                ):
+                    raise ValueError(f"Invalid JSON array item: {e}") from e
+            else:
+                delimiter = _WHITESPACE.match(buf, end).end()  # type: ignore[union-attr]
+                if delimiter < len(buf) and buf[delimiter] in ",]":
+                    item_offset = byte_offset(pos)
+                    yield item, item_offset, byte_offset(end) - item_offset
+                    pos = delimiter
+                    continue
+                if delimiter < len(buf) and buf[end:].strip(_NUMBER_CHARS):
+                    raise ValueError(
+                        f"Expected ',' or ']' after array item, got {buf[delimiter]!r}"
+                    )
+
+        if eof:
+            raise ValueError("Unexpected end of JSON array.")
+
+        # Drop what was already consumed and read more. Reading at least as much as is
+        # already buffered keeps reading large items linear.
+        mark_offset = byte_offset(pos)
+        buf = buf[pos:]
+        pos = mark_pos = 0
+
+        chunk = file.read(max(chunk_size, len(buf)))
+        eof = not chunk
+        buf += decoder.decode(chunk, final=eof)
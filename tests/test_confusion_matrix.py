@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from scripts import confusion_matrix
+from scripts.confusion_matrix import (
+    LabelCodes,
+    SparseCounts,
+    align_counts,
+    count_pairs_sparse,
+    encode_fields,
+)
+
+
+def test_encode_fields() -> None:
+    data = [{"gold": "b", "pred": 1}, {"gold": "a"}, {"gold": "b", "pred": 1}]
+
+    labels = encode_fields(data, ["gold", "pred"], batch_size=2)
+
+    assert labels["gold"].values == ["a", "b"]
+    assert labels["gold"].codes.tolist() == [1, 0, 1]
+    assert labels["pred"].values == [1, "N/A"]
+    assert labels["pred"].codes.tolist() == [0, 1, 0]
+
+
+def test_encode_fields_rejects_non_objects() -> None:
+    # Parsed JSON isn't checked against the annotation.
+    data: list[Any] = [{"gold": "a"}, ["a"]]
+
+    with pytest.raises(ValueError, match="Expected a list of objects"):
+        encode_fields(data, ["gold"])
+
+
+def test_counts_aligned_and_dense() -> None:
+    data = [{"gold": "a", "pred": "b"}, {"gold": "a", "pred": "b"}, {"gold": "c"}]
+    labels = encode_fields(data, ["gold", "pred"])
+
+    counts = count_pairs_sparse(labels["gold"], labels["pred"])
+    assert counts.col_values == ["N/A", "b"]
+    assert counts.dense().tolist() == [[0, 2], [1, 0]]
+
+    aligned = align_counts(counts)
+    assert aligned.row_values == aligned.col_values == ["N/A", "a", "b", "c"]
+    assert aligned.dense().tolist() == [
+        [0, 0, 0, 0],
+        [0, 0, 2, 0],
+        [0, 0, 0, 0],
+        [1, 0, 0, 0],
+    ]
+
+
+def test_main_counts_each_pair_once(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    path = tmp_path / "data.jsonl"
+    path.write_text('{"gold": "a", "pred": "a"}\n{"gold": "b", "pred": "a"}\n')
+    calls: list[str] = []
+
+    def count(labels1: LabelCodes, labels2: LabelCodes) -> SparseCounts:
+        calls.append("count")
+        return count_pairs_sparse(labels1, labels2)
+
+    monkeypatch.setattr(confusion_matrix, "count_pairs_sparse", count)
+    monkeypatch.setattr(sys, "argv", [",confusion-matrix", str(path), "gold", "pred"])
+    confusion_matrix.main()
+    monkeypatch.setattr(sys, "argv", [*sys.argv, "--metrics", "--bootstrap", "10"])
+    confusion_matrix.main()
+
+    assert calls == ["count", "count"]
+    assert "accuracy       0.5000" in capsys.readouterr().out
+
+
+def test_main_rejects_confidence(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setattr(
+        sys, "argv", [",confusion-matrix", "-", "a", "b", "--confidence", "95"]
+    )
+
+    with pytest.raises(SystemExit):
+        confusion_matrix.main()
+    assert "--confidence must be between 0 and 1" in capsys.readouterr().err
@@ -0,0 +1,318 @@
+import io
+import itertools
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+import tiktoken
+import typer
+from tiktoken_ext import openai_public  # type: ignore
+from typer.testing import CliRunner
+
+from scripts import estimate_tokens, ntok_client
+
+# Characters of the texts whose chunked counts are tested.
+_ALPHABET = " \t\r\n'abst12/.,"
+
+
+class _WordTokeniser:
+    """Tokeniser with one token per word, to test without downloading an encoding."""
+
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+
+    def encode(self, text: str) -> list[str]:
+        self.texts.append(text)
+        return text.split()
+
+    def encode_ordinary_batch(
+        self, texts: list[str], num_threads: int
+    ) -> list[list[str]]:
+        return [text.split() for text in texts]
+
+
+def test_count_json_fields_missing(monkeypatch: pytest.MonkeyPatch) -> None:
+    def encoding(name: str) -> _WordTokeniser:
+        return _WordTokeniser()
+
+    monkeypatch.setattr(estimate_tokens, "_encoding", encoding)
+    records = [
+        {"prompt": "a b c", "answer": "d"},
+        {"prompt": "e f"},
+        {"answer": None},
+        "not an object",
+    ]
+
+    fields, totals = estimate_tokens.count_json_fields(
+        records, ["prompt", "answer"], "cl100k_base", threads=1, batch_size=3
+    )
+
+    assert fields["prompt"].records == 2
+    assert fields["prompt"].missing == 2
+    assert fields["prompt"].tokens == 5
+    assert fields["answer"].records == 1
+    assert fields["answer"].missing == 3
+    assert totals.records == 2
+    assert totals.missing == 2
+    assert totals.quantile(1) == 4
+
+
+def _small_encoding(name: str, monkeypatch: pytest.MonkeyPatch) -> tiktoken.Encoding:
+    """Encoding with the pre-tokeniser of `name` and a vocabulary of short tokens.
+
+    Every piece of up to 3 characters of `_ALPHABET` is a single token, so pieces cut
+    at a chunk boundary change the count. The real vocabularies can't be downloaded in
+    the tests.
+    """
+    tokens = [bytes([i]) for i in range(256)]
+    for size in (2, 3):
+        tokens.extend(
+            "".join(chars).encode()
+            for chars in itertools.product(_ALPHABET, repeat=size)
+        )
+
+    def load_ranks(*_: object, **__: object) -> dict[bytes, int]:
+        return {token: rank for rank, token in enumerate(tokens)}
+
+    with monkeypatch.context() as patch:
+        patch.setattr(openai_public, "load_tiktoken_bpe", load_ranks)
+        spec: dict[str, Any] = getattr(openai_public, name)()
+    spec.pop("explicit_n_vocab", None)
+    return tiktoken.Encoding(**spec)
+
+
+@pytest.mark.parametrize("name", ["cl100k_base", "o200k_base", "r50k_base"])
+def test_chunked_count_equals_whole_count(
+    name: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def small_encoding(_: str) -> tiktoken.Encoding:
+        return encoding
+
+    encoding = _small_encoding(name, monkeypatch)
+    monkeypatch.setattr(estimate_tokens, "_encoding", small_encoding)
+    rng = random.Random(0)
+    texts = [
+        "a  b   \t c\n\n\n  d  \n\t\tst  ",
+        "don't it's we'll I'M they'RE 's 't",
+        "12345 678\n9 1,234.5 1234567",
+        "a\r\n\r\nb\r\n c \r\n\r\n  \r\nd\r",
+        "a/\n/b //\n\n/ .,/\r\n/",
+        "é É  é\n\nÉé 12é",
+    ] + [
+        "".join(rng.choice(_ALPHABET + "éA") for _ in range(rng.randrange(60)))
+        for _ in range(200)
+    ]
+
+    for text in texts:
+        expected = len(encoding.encode(text))
+        data = text.encode()
+        for chunk_size in (1, 2, 3, 5, 8):
+            counted = estimate_tokens.count_tokens(io.BytesIO(data), name, chunk_size)
+            assert counted == (expected, len(data)), (text, chunk_size)
+
+
+def test_expand_paths(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    for name in ["a.py", "b.txt", "src/c.py", "src/deep/d.py", ".git/config"]:
+        Path(name).parent.mkdir(parents=True, exist_ok=True)
+        Path(name).write_text("x")
+
+    assert estimate_tokens.expand_paths([Path("src")], gitignore=False) == [
+        Path("src/c.py"),
+        Path("src/deep/d.py"),
+    ]
+    assert estimate_tokens.expand_paths([Path(".")], gitignore=False) == [
+        Path("a.py"),
+        Path("b.txt"),
+        Path("src/c.py"),
+        Path("src/deep/d.py"),
+    ]
+    assert estimate_tokens.expand_paths(
+        [Path("**/*.py"), Path("a.py"), Path("b.txt")], gitignore=False
+    ) == [Path("a.py"), Path("src/c.py"), Path("src/deep/d.py"), Path("b.txt")]
+
+    with pytest.raises(typer.BadParameter, match="missing"):
+        estimate_tokens.expand_paths([Path("a.py"), Path("missing")], gitignore=False)
+    with pytest.raises(typer.BadParameter, match=r"\*\.rs"):
+        estimate_tokens.expand_paths([Path("*.rs")], gitignore=False)
+
+
+def test_expand_paths_gitignore(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    subprocess.run(["git", "init", "-q"], check=True)
+    Path(".gitignore").write_text("*.log\n")
+    Path("a.py").write_text("x")
+    Path("b.log").write_text("x")
+
+    found = estimate_tokens.expand_paths([Path(".")], gitignore=True)
+    assert found == [Path(".gitignore"), Path("a.py")]
+    # Files given explicitly are kept even if they're ignored.
+    assert estimate_tokens.expand_paths([Path("b.log")], gitignore=True) == [
+        Path("b.log")
+    ]
+
+
+@pytest.fixture
+def tokeniser(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> _WordTokeniser:
+    """Word tokeniser for every encoding, with the cache and daemon under `tmp_path`."""
+    tokeniser = _WordTokeniser()
+
+    def encoding(name: str) -> _WordTokeniser:
+        return tokeniser
+
+    monkeypatch.setattr(estimate_tokens, "_encoding", encoding)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tokeniser
+
+
+def test_cache_hits_and_invalidation(tmp_path: Path, tokeniser: _WordTokeniser) -> None:
+    path = tmp_path / "a.txt"
+    path.write_text("one two three")
+
+    def run(*args: str) -> str:
+        result = CliRunner().invoke(estimate_tokens.app, [str(path), "-j", "1", *args])
+        assert result.exit_code == 0, result.output
+        return result.stdout.strip()
+
+    assert run() == "3"
+    assert run() == "3"
+    assert "".join(tokeniser.texts) == "one two three"
+    assert (tmp_path / "cache" / "scripts" / "ntok.sqlite").is_file()
+
+    # A different encoding or content is a miss, and the old entries are still used.
+    assert run("-e", "o200k_base") == "3"
+    path.write_text("one two")
+    assert run() == "2"
+    assert "".join(tokeniser.texts) == "one two three" * 2 + "one two"
+    path.write_text("one two three")
+    assert run() == "3"
+    assert run("--no-cache") == "3"
+    assert "".join(tokeniser.texts) == "one two three" * 2 + "one two" + "one two three"
+
+    with estimate_tokens.TokenCache.default() as cache:
+        assert cache.lifetime_stats() == (2, 3)
+
+
+def test_cache_evicts_least_recently_used(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    clock = itertools.count()
+    monkeypatch.setattr(time, "time", lambda: float(next(clock)))
+    path = tmp_path / "ntok.sqlite"
+
+    with estimate_tokens.TokenCache(path, max_entries=2) as cache:
+        for digest in [b"a", b"b", b"c"]:
+            cache.put(digest, "cl100k_base", 1, 1)
+        assert cache.get(b"a", "cl100k_base") == (1, 1)
+
+    with estimate_tokens.TokenCache(path, max_entries=2) as cache:
+        assert cache.get(b"b", "cl100k_base") is None
+        assert cache.get(b"a", "cl100k_base") == (1, 1)
+        assert cache.get(b"c", "cl100k_base") == (1, 1)
+        assert (cache.hits, cache.misses) == (2, 1)
+
+
+# Runs the daemon with a word tokeniser, since the encodings can't be downloaded.
+_DAEMON = """
+from scripts import estimate_tokens
+
+class Tokeniser:
+    def encode(self, text):
+        return text.split()
+
+estimate_tokens._encoding = lambda name: Tokeniser()
+estimate_tokens.serve_daemon(["cl100k_base"])
+"""
+
+
+def _stale_socket(path: Path) -> None:
+    """Leave a socket file at `path` that nothing listens on, like a killed daemon."""
+    path.parent.mkdir(mode=0o700, exist_ok=True)
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.bind(str(path))
+
+
+def test_daemon_round_trip(
+    tmp_path: Path,
+    tokeniser: _WordTokeniser,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    socket_path = Path(ntok_client.daemon_socket_path())
+    assert socket_path.parent == tmp_path / "ntok"
+    _stale_socket(socket_path)
+    text = tmp_path / "a.txt"
+    text.write_text("one two three")
+    binary = tmp_path / "b.bin"
+    binary.write_bytes(b"\0")
+
+    env = {**os.environ, "PYTHONPATH": str(Path(estimate_tokens.__file__).parents[1])}
+    daemon = subprocess.Popen([sys.executable, "-c", _DAEMON], env=env)
+    try:
+        deadline = time.monotonic() + 10
+        while ntok_client.query_daemon("cl100k_base") is None:
+            assert time.monotonic() < deadline, "The daemon didn't start."
+            time.sleep(0.05)
+
+        assert not socket_path.parent.stat().st_mode & 0o077
+        assert not socket_path.stat().st_mode & 0o077
+        assert ntok_client.query_daemon("cl100k_base", [text, binary]) == [
+            (3, 13),
+            None,
+        ]
+        stdin = io.BytesIO(b"four five")
+        assert ntok_client.query_daemon("cl100k_base", stdin=stdin) == [(2, 9)]
+
+        # The client counts a single file without the full app.
+        monkeypatch.setattr(estimate_tokens, "app", None)
+        monkeypatch.setattr(sys, "argv", [",ntok", str(text)])
+        ntok_client.main()
+        assert capsys.readouterr().out == "3\n"
+        assert not tokeniser.texts
+    finally:
+        daemon.send_signal(signal.SIGTERM)
+        daemon.wait(10)
+    assert not socket_path.exists()
+
+
+def test_stale_socket_falls_back_to_in_process(
+    tmp_path: Path, tokeniser: _WordTokeniser, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _stale_socket(Path(ntok_client.daemon_socket_path()))
+    path = tmp_path / "a.txt"
+    path.write_text("one two three")
+
+    assert ntok_client.query_daemon("cl100k_base", [path]) is None
+    result = CliRunner().invoke(estimate_tokens.app, [str(path), "--no-cache"])
+    assert result.exit_code == 0, result.output
+    assert result.stdout == "3\n"
+
+    # The client runs the full app when the daemon can't count.
+    ran: list[list[str]] = []
+    monkeypatch.setattr(estimate_tokens, "app", lambda: ran.append(sys.argv))
+    monkeypatch.setattr(sys, "argv", [",ntok", str(path)])
+    ntok_client.main()
+    assert ran == [[",ntok", str(path)]]
+
+
+def test_daemon_socket_must_be_private(tokeniser: _WordTokeniser) -> None:
+    socket_path = Path(ntok_client.daemon_socket_path())
+    socket_path.parent.mkdir(mode=0o755)
+    socket_path.parent.chmod(0o755)
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.bind(str(socket_path))
+        sock.listen()
+        assert ntok_client.connect_daemon() is None
+        with pytest.raises(SystemExit, match="only be accessible by you"):
+            estimate_tokens.serve_daemon(["cl100k_base"])
@@ -0,0 +1,54 @@
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+from scripts import getschema
+from scripts.getschema import read_records
+
+
+class _Pipe(io.BytesIO):
+    """Stream that can't seek, like stdin."""
+
+    def seekable(self) -> bool:
+        return False
+
+
+@pytest.mark.parametrize(
+    ("data", "schema", "single_value"),
+    [
+        (b'[{"a": 1}, {"a": "x"}]', [{"a": "int"}, {"a": "string"}], False),
+        (b'{"a": 1}\n{"a": "x"}\n', [{"a": "int"}, {"a": "string"}], False),
+        (b'{"a": 1}\n', {"a": "int"}, True),
+        (
+            b'\xef\xbb\xbf{\n  "a": 1,\n  "b": [true]\n}\n',
+            {"a": "int", "b": ["bool"]},
+            True,
+        ),
+    ],
+    ids=["array", "jsonl", "one-line", "pretty-object"],
+)
+def test_read_records_without_seeking(
+    data: bytes, schema: object, single_value: bool
+) -> None:
+    shapes = read_records(io.BufferedReader(_Pipe(data)))
+
+    assert shapes.single_value == single_value
+    assert shapes.schema() == schema
+
+
+def test_sample_rejects_jobs(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    path = tmp_path / "data.jsonl"
+    path.write_text('{"a": 1}\n')
+    monkeypatch.setattr(
+        sys, "argv", [",json-schema", str(path), "-", "--sample", "1", "-j", "2"]
+    )
+
+    with pytest.raises(SystemExit):
+        getschema.main()
+    assert "--jobs can't be used with --sample" in capsys.readouterr().err
@@ -0,0 +1,51 @@
+import math
+from pathlib import Path
+from typing import Any
+
+import pytest
+from typer.testing import CliRunner
+
+from scripts import json_freq
+from scripts.json_freq import NumericSummary, TDigest
+
+
+def test_numeric_summary_skips_huge_integers() -> None:
+    summary = NumericSummary()
+    summary.update([1, 10**400, 2.5, math.inf, "3", -(10**400), 3])
+
+    assert summary.count == 3
+    assert summary.skipped == 4
+    assert (summary.low, summary.high) == (1, 3)
+    assert math.isclose(summary.mean, 6.5 / 3)
+
+
+@pytest.mark.parametrize("approx", [False, True])
+def test_histogram_of_equal_numbers(approx: bool) -> None:
+    summary = NumericSummary(TDigest() if approx else None)
+    summary.update([5, 5.0, 5])
+
+    counts, edges = summary.histogram(10)
+    assert counts.tolist() == [3]
+    assert edges.tolist() == [5, 5]
+
+    counts, _ = summary.histogram(10, log=True)
+    assert counts.tolist() == [3]
+
+
+def test_exact_counts_use_one_process_by_default(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "a.jsonl").write_text('{"k": 1}\n')
+    calls: list[int | None] = []
+
+    def record_jobs(*_: Any, jobs: int | None, **__: Any) -> None:
+        calls.append(jobs)
+
+    monkeypatch.setattr(json_freq, "show_frequencies", record_jobs)
+    monkeypatch.setattr(json_freq, "show_approx_frequencies", record_jobs)
+    runner = CliRunner()
+    for args in [[], ["--approx"], ["-j", "2"]]:
+        result = runner.invoke(json_freq.app, [str(tmp_path), "k", *args])
+        assert result.exit_code == 0, result.output
+
+    assert calls == [1, None, 2]
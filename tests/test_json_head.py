@@ -0,0 +1,41 @@
+import gzip
+import json
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from scripts.json_head import app, index_path
+
+_ITEMS = [{"id": i, "text": "é" * i} for i in range(5)]
+
+
+def test_index_with_bom(tmp_path: Path) -> None:
+    path = tmp_path / "bom.json"
+    path.write_bytes(b"\xef\xbb\xbf" + json.dumps(_ITEMS, indent=2).encode())
+
+    result = CliRunner().invoke(app, [str(path), "--at", "-1", "--index"])
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.stdout) == _ITEMS[-1]
+
+
+def test_index_rejects_compressed(tmp_path: Path) -> None:
+    path = tmp_path / "data.json.gz"
+    path.write_bytes(gzip.compress(json.dumps(_ITEMS).encode()))
+
+    result = CliRunner().invoke(app, [str(path), "--at", "0", "--index"])
+
+    assert result.exit_code != 0
+    assert "uncompressed" in result.output
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_failed_index_leaves_no_files(tmp_path: Path) -> None:
+    path = tmp_path / "broken.json"
+    path.write_text('[{"id": 1}, {"id": ')
+
+    result = CliRunner().invoke(app, [str(path), "--index"])
+
+    assert result.exit_code != 0
+    assert not index_path(path).exists()
+    assert list(tmp_path.iterdir()) == [path]
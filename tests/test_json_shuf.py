@@ -0,0 +1,65 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from scripts import json_shuf
+
+_ITEMS = [{"i": i} for i in range(20)]
+
+
+def _shuffle(
+    monkeypatch: pytest.MonkeyPatch, path: Path, *args: str
+) -> list[dict[str, int]]:
+    output = path.with_name("out.json")
+    monkeypatch.setattr(
+        sys, "argv", [",json-shuf", str(path), str(output), "--seed", "1", *args]
+    )
+    json_shuf.main()
+    return json.loads(output.read_text())
+
+
+@pytest.mark.parametrize("jsonl", [False, True], ids=["array", "jsonl"])
+def test_out_of_core_with_bom(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, jsonl: bool
+) -> None:
+    path = tmp_path / "in.json"
+    text = (
+        "".join(f"{json.dumps(item)}\n" for item in _ITEMS)
+        if jsonl
+        else json.dumps(_ITEMS)
+    )
+    path.write_bytes(b"\xef\xbb\xbf" + text.encode())
+
+    shuffled = _shuffle(monkeypatch, path, "--out-of-core")
+    assert shuffled == _shuffle(monkeypatch, path)
+    assert sorted(shuffled, key=lambda item: item["i"]) == _ITEMS
+
+
+def test_out_of_core_with_gzip(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "in.json"
+    path.write_text(json.dumps(_ITEMS))
+    expected = _shuffle(monkeypatch, path, "--out-of-core")
+
+    compressed = tmp_path / "in.json.gz"
+    compressed.write_bytes(gzip.compress(path.read_bytes()))
+    assert _shuffle(monkeypatch, compressed, "--out-of-core") == expected
+
+
+@pytest.mark.parametrize("jsonl", [False, True], ids=["array", "jsonl"])
+def test_sample_with_bom_and_newline(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, jsonl: bool
+) -> None:
+    path = tmp_path / "in.json"
+    text = (
+        "".join(f"{json.dumps(item)}\n" for item in _ITEMS)
+        if jsonl
+        else json.dumps(_ITEMS)
+    )
+    path.write_bytes(b"\xef\xbb\xbf\n" + text.encode())
+
+    sample = _shuffle(monkeypatch, path, "-k", "5")
+    assert len(sample) == 5
+    assert all(item in _ITEMS for item in sample)
@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from scripts import profiling
+
+
+def test_profiled_adds_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    started: list[Path | None] = []
+    monkeypatch.setattr(profiling, "start", started.append)
+    calls: list[tuple[str, int]] = []
+    app = typer.Typer()
+
+    @app.command()
+    @profiling.profiled
+    def main(name: str, count: int = 1) -> None:
+        calls.append((name, count))
+
+    runner = CliRunner()
+    assert runner.invoke(app, ["a", "--count", "2"]).exit_code == 0
+    assert runner.invoke(app, ["b", "--profile"]).exit_code == 0
+    assert runner.invoke(app, ["c", "--profile-stats", "out.prof"]).exit_code == 0
+
+    assert calls == [("a", 2), ("b", 1), ("c", 1)]
+    assert started == [None, Path("out.prof")]
@@ -0,0 +1,88 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from scripts import profiling, rename_json
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, *args: str) -> None:
+    monkeypatch.setattr(sys, "argv", [",rename-json", *args])
+    rename_json.main()
+
+
+def test_inputs_missing_required_key(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "good.jsonl").write_text('{"a": 1, "b": 2}\n')
+    (inputs / "bad.jsonl").write_text('{"a": 1, "b": 2}\n{"b": 3}\n')
+    output_dir = tmp_path / "out"
+
+    with pytest.raises(ValueError, match="Object 1 is missing key 'a'"):
+        _run(monkeypatch, "a:x", "b=0", "--inputs", str(inputs), "-O", str(output_dir))
+
+    assert [path.name for path in output_dir.iterdir()] == ["good.jsonl"]
+    assert json.loads((output_dir / "good.jsonl").read_text()) == {"x": 1, "b": 2}
+
+
+def test_output_replaced_only_on_success(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    input_path = tmp_path / "in.json"
+    output_path = tmp_path / "out.json"
+    output_path.write_text("previous")
+
+    input_path.write_text('[{"a": 1}, {"b": 2}]')
+    with pytest.raises(ValueError, match="missing key"):
+        _run(monkeypatch, str(input_path), str(output_path), "a")
+    assert output_path.read_text() == "previous"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["in.json", "out.json"]
+
+    input_path.write_text('[{"a": 1}, {"a": 2, "b": 3}]')
+    _run(monkeypatch, str(input_path), str(output_path), "a", "b=null")
+    assert json.loads(output_path.read_text()) == [
+        {"a": 1, "b": None},
+        {"a": 2, "b": 3},
+    ]
+
+
+def test_projection_with_escaped_and_nested_keys() -> None:
+    fields = [
+        rename_json.parse_field(spec)
+        for spec in [r"a\.b:ab", "m.id", r"m.x\=y:c\:d=[1]", "k=a=b"]
+    ]
+    assert [field.path for field in fields] == [
+        ("a.b",),
+        ("m", "id"),
+        ("m", "x=y"),
+        ("k",),
+    ]
+    assert [field.name for field in fields] == ["ab", "m.id", "c:d", "k"]
+
+    project = rename_json.compile_projection(fields)
+    assert project({"a.b": 1, "m": {"id": 2}}) == {
+        "ab": 1,
+        "m.id": 2,
+        "c:d": [1],
+        "k": "a=b",
+    }
+    with pytest.raises(KeyError):
+        project({"a.b": 1, "m": {}})
+
+
+def test_profile_records_projection(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    profiler = profiling.Profiler()
+    monkeypatch.setattr(profiling, "profiler", profiler)
+    input_path = tmp_path / "in.jsonl"
+    input_path.write_text('{"a": 1}\n{"a": 2}\n{"a": 3}\n')
+
+    _run(monkeypatch, str(input_path), str(tmp_path / "out.jsonl"), "a:b")
+
+    assert profiler.phases["project"].records == 3
+    assert profiler.phases["read"].records == 3
+    assert profiler.phases["write"].records == 3
@@ -0,0 +1,43 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from scripts.util import iter_json_offsets, load_json, read_json
+
+
+def _offsets(data: bytes, chunk_size: int = 1 << 20) -> list[tuple[object, int, int]]:
+    return list(iter_json_offsets(io.BufferedReader(io.BytesIO(data)), chunk_size))
+
+
+def test_json_lines_of_arrays(tmp_path: Path) -> None:
+    records = [[i, "x"] for i in range(150)]
+    path = tmp_path / "arrays.jsonl"
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    assert list(read_json(path)) == records
+    assert load_json(path) == records
+
+
+def test_array_with_trailing_data() -> None:
+    with pytest.raises(ValueError, match="after the JSON array"):
+        _offsets(b"[1,\n 2]\n[3]\n", chunk_size=4)
+
+
+@pytest.mark.parametrize("chunk_size", [4, 1 << 20])
+@pytest.mark.parametrize(
+    "data",
+    [
+        b'[\n  {"a": 1},\n  {"b": "\xc3\xa9"}\n]\n',
+        b'{"a": 1}\n\n{"b": "\xc3\xa9"}\n',
+    ],
+    ids=["array", "jsonl"],
+)
+def test_offsets_with_bom(data: bytes, chunk_size: int) -> None:
+    data = b"\xef\xbb\xbf" + data
+    items = _offsets(data, chunk_size)
+
+    assert [item for item, _, _ in items] == [{"a": 1}, {"b": "é"}]
+    for item, offset, length in items:
+        assert json.loads(data[offset : offset + length]) == item